@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class CoresConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import sqlite, stats  # noqa: F401
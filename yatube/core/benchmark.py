@@ -0,0 +1,100 @@
+import statistics
+import time
+
+
+def percentile(samples, fraction):
+    """Перцентиль по ближайшему рангу, samples уже отсортированы."""
+    index = max(0, int(round(fraction * len(samples))) - 1)
+    return samples[min(index, len(samples) - 1)]
+
+
+def measure(func, repeat=20, warmup=2, setup=None):
+    """Время выполнения func в миллисекундах: p50, p95 и среднее.
+
+    setup, если передан, вызывается перед каждым запуском и в замер
+    не входит.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'p50': round(percentile(samples, 0.5), 3),
+        'p95': round(percentile(samples, 0.95), 3),
+        'mean': round(statistics.mean(samples), 3),
+    }
+
+
+def find_regressions(current, baseline, tolerance):
+    """Сравнивает результаты с базовыми: больше запросов или медленнее.
+
+    Оба аргумента - словари {имя: {'queries': n, 'p95': ms, ...}}.
+    """
+    regressions = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append('%s: запросов %s, было %s' % (
+                name, result['queries'], base['queries']))
+        if result['p95'] > base['p95'] * (1 + tolerance):
+            regressions.append('%s: p95 %.3f ms, было %.3f ms' % (
+                name, result['p95'], base['p95']))
+    return regressions
+
+
+class QueryCounter:
+    """Обертка для connection.execute_wrapper: считает SQL-запросы."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryRecorder(QueryCounter):
+    """Как QueryCounter, но еще запоминает SQL и параметры запросов."""
+
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, params))
+        return super().__call__(execute, sql, params, many, context)
+
+
+def query_plan(connection, sql, params=()):
+    """Строки EXPLAIN QUERY PLAN (SQLite) для запроса."""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan):
+    """Шаги плана с полным просмотром таблицы или сортировкой в памяти.
+
+    SCAN по индексу допустим: так читаются ленты, отсортированные
+    индексом. Просмотр подзапроса (CO-ROUTINE) таблицу не читает.
+    """
+    subqueries = {
+        step.split()[-1] for step in plan
+        if step.startswith(('CO-ROUTINE', 'MATERIALIZE'))
+    }
+    return [
+        step for step in plan
+        if step.startswith('USE TEMP B-TREE')
+        or (step.startswith('SCAN') and ' USING ' not in step
+            and step.split()[1] not in subqueries)
+    ]
@@ -0,0 +1,221 @@
+import hashlib
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from core import db_router, holes, single_flight
+
+VERSION_KEY = 'version:%s'
+PAGE_KEY = 'page:%s:%s:'
+
+
+def _new_token():
+    # время смены версии в мс служит Last-Modified страниц области
+    return '%x-%06x' % (int(time.time() * 1000), random.getrandbits(24))
+
+
+def _token_time(token):
+    try:
+        return int(token.split('-')[0], 16) / 1000
+    except ValueError:
+        return time.time()
+
+
+def _digest(value):
+    # имена пользователей и слаги не обязаны быть безопасными для memcached
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def version_key(scope):
+    return VERSION_KEY % _digest(scope)
+
+
+def get_versions(scopes):
+    """Текущие версии областей; отсутствующие создаются."""
+    keys = [version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            token = _new_token()
+            cache.add(key, token, None)
+            # add мог проиграть гонку: берем версию, которая сохранилась
+            found[key] = cache.get(key) or token
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Выдает областям новые версии: старые ключи просто перестают читаться.
+
+    Версия - случайный токен, поэтому сменить версии любого числа
+    областей можно одним set_many и без гонок инкремента.
+    """
+    if scopes:
+        cache.set_many(
+            {version_key(scope): _new_token() for scope in scopes}, None
+        )
+
+
+def invalidate(*scopes):
+    """Меняет версии сразу и еще раз после коммита.
+
+    Повторная смена закрывает гонку, когда страницу успели закешировать
+    между первой сменой и коммитом изменений.
+    """
+    bump(*scopes)
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def _page_key(prefix, versions, parts):
+    digest = _digest(':'.join(str(part) for part in parts))
+    return PAGE_KEY % (prefix, '.'.join(versions)) + digest
+
+
+def versioned_key(prefix, scopes, *parts):
+    return _page_key(prefix, get_versions(scopes), parts)
+
+
+def _resolve_scopes(request, scope_templates, kwargs):
+    """Шаблоны областей форматируются аргументами из URL и текущим
+    пользователем; callable(request, **kwargs) возвращает список областей.
+    """
+    scopes = []
+    for template in scope_templates:
+        if callable(template):
+            scopes.extend(template(request, **kwargs))
+        else:
+            scopes.append(template.format(user=request.user, **kwargs))
+    return scopes
+
+
+def _validators(request, versions):
+    """ETag и Last-Modified страницы по версиям ее областей.
+
+    Страница зависит от пользователя, а формы в ней - от CSRF-куки,
+    поэтому обе входят в ETag. Берется токен запроса, а не куки: рендер
+    мог выдать новый, и следующий запрос придет уже с ним.
+    """
+    etag = quote_etag(_digest(':'.join([
+        str(request.user.pk or 0),
+        request.META.get('CSRF_COOKIE', ''),
+        *versions,
+    ])))
+    return etag, max(_token_time(version) for version in versions)
+
+
+def _set_validators(request, response, etag, last_modified):
+    if response.status_code == 200 and not response.has_header('ETag'):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # копию можно хранить, но перед показом нужно сверить ETag
+        patch_cache_control(
+            response, no_cache=True, private=bool(request.user.pk),
+        )
+    return response
+
+
+def _page_parts(request, shared):
+    # общая страница одна на всех: пользователь - только в дырках
+    if shared:
+        return (request.get_full_path(),)
+    return (request.user.pk or 0, request.get_full_path())
+
+
+def _render(view, request, args, kwargs, shared):
+    """Ответ view; в общем рендере фрагменты пользователя - метки."""
+    if not shared:
+        return view(request, *args, **kwargs)
+    with holes.shared():
+        return view(request, *args, **kwargs)
+
+
+def _cached_render(view, request, args, kwargs, shared, key, timeout,
+                   last_modified):
+    """Страница из кеша; промах пересчитывает один воркер на всех."""
+    rendered = {}
+
+    def render():
+        response = rendered['response'] = _render(
+            view, request, args, kwargs, shared
+        )
+        # страница с отстающей реплики не должна закрепиться
+        # под новой версией ни в кеше, ни в ETag клиента
+        if (db_router.may_be_stale(last_modified)
+                or response.status_code != 200 or response.streaming):
+            return None
+        # в кеш идет страница с метками, а не с чужими фрагментами
+        return response.content, response['Content-Type']
+
+    cached = single_flight.get_or_set(key, render, timeout)
+    if 'response' in rendered:
+        return rendered['response']
+    content, content_type = cached
+    return HttpResponse(content, content_type=content_type)
+
+
+def _fill(request, response, shared):
+    if shared and not response.streaming:
+        response.content = holes.fill(request, response.content)
+    return response
+
+
+def _conditional(view, scope_templates, cache_pages, timeout, shared=False):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        scopes = _resolve_scopes(request, scope_templates, kwargs)
+        if not scopes:
+            return view(request, *args, **kwargs)
+        versions = get_versions(scopes)
+        etag, last_modified = _validators(request, versions)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified),
+        )
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        if cache_pages:
+            response = _cached_render(
+                view, request, args, kwargs, shared,
+                _page_key(
+                    view.__name__, versions, _page_parts(request, shared)
+                ),
+                timeout or settings.PAGE_CACHE_TIMEOUT, last_modified,
+            )
+        else:
+            response = _render(view, request, args, kwargs, shared)
+        response = _fill(request, response, shared)
+        if db_router.may_be_stale(last_modified):
+            return response
+        etag = _validators(request, versions)[0]
+        return _set_validators(request, response, etag, last_modified)
+    return wrapper
+
+
+def conditional_versioned(*scope_templates):
+    """Отвечает 304 на If-None-Match/If-Modified-Since по версиям
+    областей, не вызывая view; сами страницы не кеширует."""
+    def decorator(view):
+        return _conditional(view, scope_templates, False, None)
+    return decorator
+
+
+def cache_versioned(*scope_templates, timeout=None, shared=False):
+    """Кеширует страницу под ключом с версиями областей и отвечает
+    304, если у клиента та же версия.
+
+    Шаблоны областей форматируются аргументами из URL и текущим
+    пользователем: cache_versioned('group:{slug}'). С shared=True
+    страница кешируется одна на всех пользователей, а их фрагменты
+    подставляются в нее при ответе (core.holes).
+    """
+    def decorator(view):
+        return _conditional(view, scope_templates, True, timeout, shared)
+    return decorator
@@ -0,0 +1,140 @@
+"""Чтение с реплик и запись в основную базу.
+
+ReplicaMiddleware выбирает на запрос одну реплику из DATABASE_REPLICAS,
+и ReplicaRouter отправляет на нее чтения. В основную базу идут:
+- все записи и все чтения после первой записи в запросе;
+- запросы с небезопасными методами и view с декоратором use_primary;
+- запросы пользователя в течение REPLICA_STICKY_SECONDS после его
+  записи (кука primary_until), чтобы он сразу видел свои посты.
+
+Вне запроса (команды, фоновые задачи) все идет в основную базу.
+"""
+import contextvars
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class _State:
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+        self.read_replica = False
+
+
+_state = contextvars.ContextVar('db_routing', default=None)
+
+
+def use_primary(view):
+    """Весь запрос к view читает из основной базы."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if state is not None:
+            state.replica = None
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def may_be_stale(since):
+    """Запрос читал реплику, а данные менялись (since) меньше
+    REPLICA_STICKY_SECONDS назад: реплика могла их еще не получить."""
+    state = _state.get()
+    return (
+        state is not None and state.read_replica
+        and time.time() - since < settings.REPLICA_STICKY_SECONDS
+    )
+
+
+def _sticky(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _routed(content, state):
+    """Тело потокового ответа читает базу уже после middleware:
+    каждый кусок берется под выбором базы этого запроса."""
+    chunks = iter(content)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
+
+
+class ReplicaMiddleware:
+    """Ставится до сессий и аутентификации: их чтения тоже на реплике."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        replica = None
+        if (replicas and request.method in SAFE_METHODS
+                and not _sticky(request)):
+            replica = random.choice(replicas)
+        state = _State(replica)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if response.streaming:
+            response.streaming_content = _routed(
+                response.streaming_content, state
+            )
+        if state.wrote and replicas:
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, '%.3f' % (time.time() + seconds),
+                max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+def _foreign(hints):
+    """Объект из базы вне основной и реплик: ее выбирает сам Django."""
+    instance = hints.get('instance')
+    db = instance._state.db if instance is not None else None
+    return bool(db) and db != DEFAULT_DB_ALIAS and (
+        db not in settings.DATABASE_REPLICAS
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None or _foreign(hints):
+            return None
+        state.read_replica = True
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        if _foreign(hints):
+            return None
+        state = _state.get()
+        if state is not None:
+            # дальше в этом запросе читаем только что записанное
+            state.wrote = True
+            state.replica = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики - копии основной базы
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
@@ -0,0 +1,78 @@
+"""Дырки в общих страницах: фрагменты, зависящие от пользователя.
+
+Страница под cache_versioned(..., shared=True) рендерится и кешируется
+одна на всех. Тег {% hole 'имя' ... %} в таком рендере оставляет
+метку, а при каждом ответе fill() заменяет метки маленькими рендерами
+для текущего запроса. Вне общего рендера тег сразу выводит фрагмент.
+
+Фрагмент - функция fragment(request, **kwargs) -> str, объявленная
+через @register('имя'); kwargs должны сериализоваться в JSON.
+"""
+import base64
+import json
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+MARKER = '<!--hole:%s-->'
+# текст постов экранируется, поэтому метку нельзя подделать содержимым
+PATTERN = re.compile(rb'<!--hole:([A-Za-z0-9_=-]+)-->')
+
+_fragments = {}
+_shared = ContextVar('holes_shared', default=False)
+
+
+def register(name):
+    def decorator(fragment):
+        _fragments[name] = fragment
+        return fragment
+    return decorator
+
+
+@contextmanager
+def shared():
+    """Рендер внутри блока общий: фрагменты становятся метками."""
+    token = _shared.set(True)
+    try:
+        yield
+    finally:
+        _shared.reset(token)
+
+
+def punch(request, name, **kwargs):
+    """Фрагмент name: метка в общем рендере, иначе готовый HTML."""
+    if not _shared.get():
+        return mark_safe(_fragments[name](request, **kwargs))
+    payload = json.dumps([name, kwargs], separators=(',', ':'))
+    return mark_safe(
+        MARKER % base64.urlsafe_b64encode(payload.encode()).decode()
+    )
+
+
+def fill(request, content):
+    """Заменяет метки в content (bytes) фрагментами для request."""
+    rendered = {}
+
+    def replace(match):
+        payload = match.group(1)
+        if payload not in rendered:
+            name, kwargs = json.loads(base64.urlsafe_b64decode(payload))
+            rendered[payload] = str(
+                _fragments[name](request, **kwargs)
+            ).encode()
+        return rendered[payload]
+
+    return PATTERN.sub(replace, content)
+
+
+@register('header')
+def header(request):
+    return render_to_string('includes/header.html', request=request)
+
+
+@register('switcher')
+def switcher(request):
+    return render_to_string('includes/switcher.html', request=request)
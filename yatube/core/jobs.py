@@ -0,0 +1,57 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+def _get_pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_JOBS_WORKERS,
+                thread_name_prefix='yatube-job',
+            )
+            _slots = threading.BoundedSemaphore(
+                settings.BACKGROUND_JOBS_QUEUE_SIZE
+            )
+    return _executor, _slots
+
+
+def _run(func, args, kwargs, slots):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась ошибкой', func)
+    finally:
+        connections.close_all()
+        slots.release()
+
+
+def _submit(func, args, kwargs):
+    executor, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        # очередь заполнена: выполняем задачу в текущем потоке,
+        # чтобы не копить работу без ограничений
+        func(*args, **kwargs)
+        return
+    executor.submit(_run, func, args, kwargs, slots)
+
+
+def enqueue(func, *args, **kwargs):
+    """Ставит задачу в ограниченный пул после коммита транзакции.
+
+    Если BACKGROUND_JOBS_ASYNC выключен, задача выполняется сразу.
+    """
+    if not settings.BACKGROUND_JOBS_ASYNC:
+        func(*args, **kwargs)
+        return
+    transaction.on_commit(lambda: _submit(func, args, kwargs))
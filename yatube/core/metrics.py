@@ -0,0 +1,293 @@
+"""Метрики в текстовом формате Prometheus.
+
+MetricsMiddleware считает для каждого имени URL число запросов,
+гистограммы длительности и числа SQL-запросов, попадания и промахи
+кеша. Выгрузка - на /metrics (core.views.metrics).
+
+Без METRICS_DIR метрики живут в памяти процесса. С METRICS_DIR каждый
+процесс раз в METRICS_FLUSH_INTERVAL секунд сбрасывает свои значения
+в собственный файл каталога, а выгрузка суммирует файлы всех
+процессов, поэтому несколько воркеров дают общую картину. Каталог
+очищается при перезапуске сервиса, как у prometheus_client.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from core import stats
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUESTS = 'yatube_requests_total'
+DURATION = 'yatube_request_duration_seconds'
+QUERIES = 'yatube_request_queries'
+CACHE = 'yatube_cache_requests_total'
+CACHE_RATIO = 'yatube_cache_hit_ratio'
+
+HELP = {
+    REQUESTS: ('counter', 'Запросы по имени URL, методу и статусу.'),
+    DURATION: ('histogram', 'Длительность обработки запроса, секунды.'),
+    QUERIES: ('histogram', 'Число SQL-запросов на HTTP-запрос.'),
+    CACHE: ('counter', 'Обращения к кешу по результату (hit/miss).'),
+    CACHE_RATIO: ('gauge', 'Доля попаданий в кеш.'),
+}
+BUCKETS = {DURATION: DURATION_BUCKETS, QUERIES: QUERY_BUCKETS}
+# метод приходит от клиента: прочие значения сводятся в одно,
+# чтобы не плодить серии
+METHODS = frozenset((
+    'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS',
+))
+
+
+def _labels(**labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value):
+    return (
+        value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    )
+
+
+def _format(name, labels, value):
+    if labels:
+        name += '{%s}' % ','.join(
+            '%s="%s"' % (label, _escape(text)) for label, text in labels
+        )
+    return '%s %s' % (name, repr(float(value)) if isinstance(value, float)
+                      else value)
+
+
+class Registry:
+    """Счетчики и гистограммы одного процесса.
+
+    Гистограмма хранится как [числа попаданий в корзины..., сумма];
+    последняя корзина - +Inf.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        # блокировку мог держать поток родителя, которого нет после fork
+        self.flush_lock = threading.Lock()
+        self.name = '%s-%s.json' % (self.pid, uuid.uuid4().hex[:8])
+        self.counters = {}
+        self.histograms = {}
+        self.flushed = time.monotonic()
+
+    def _check_fork(self):
+        # После fork значения родителя принадлежат родителю.
+        if os.getpid() != self.pid:
+            self._reset()
+
+    def get_directory(self):
+        if self.directory is not None:
+            return self.directory
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self._check_fork()
+            self.counters[name, labels] = (
+                self.counters.get((name, labels), 0) + value
+            )
+
+    def observe(self, name, labels, value):
+        buckets = BUCKETS[name]
+        with self.lock:
+            self._check_fork()
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[name, labels] = (
+                    [0] * (len(buckets) + 2)
+                )
+            position = len(buckets)
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    position = index
+                    break
+            histogram[position] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            self._check_fork()
+            return {
+                'counters': [
+                    [name, labels, value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, labels, list(histogram)]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        """Сбрасывает значения в файл процесса (атомарно, os.replace).
+
+        Файл пишет один поток: без force остальные не ждут его, а
+        пропускают сброс.
+        """
+        directory = self.get_directory()
+        if not directory:
+            return
+        with self.lock:
+            self._check_fork()
+            flush_lock = self.flush_lock
+        if not flush_lock.acquire(blocking=force):
+            return
+        try:
+            interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+            if not force and time.monotonic() - self.flushed < interval:
+                return
+            self.flushed = time.monotonic()
+            snapshot = self.snapshot()
+            path = os.path.join(directory, self.name)
+            temporary = path + '.tmp'
+            with open(temporary, 'w') as stored:
+                json.dump(snapshot, stored)
+            os.replace(temporary, path)
+        finally:
+            flush_lock.release()
+
+    def _snapshots(self):
+        directory = self.get_directory()
+        if not directory:
+            return [self.snapshot()]
+        self.flush(force=True)
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as stored:
+                    snapshots.append(json.load(stored))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def collect(self):
+        """Сумма значений всех процессов: (counters, histograms)."""
+        counters, histograms = {}, {}
+        for snapshot in self._snapshots():
+            for name, labels, value in snapshot['counters']:
+                key = name, tuple(map(tuple, labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = name, tuple(map(tuple, labels))
+                total = histograms.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+        return counters, histograms
+
+    def render(self):
+        counters, histograms = self.collect()
+        samples = {name: [] for name in HELP}
+        for (name, labels), value in sorted(counters.items()):
+            samples[name].append(_format(name, labels, value))
+        for (name, labels), values in sorted(histograms.items()):
+            cumulative = 0
+            bounds = [repr(float(bound)) for bound in BUCKETS[name]]
+            for bound, count in zip(bounds + ['+Inf'], values[:-1]):
+                cumulative += count
+                samples[name].append(_format(
+                    name + '_bucket', labels + (('le', bound),), cumulative
+                ))
+            samples[name].append(_format(name + '_sum', labels, values[-1]))
+            samples[name].append(_format(name + '_count', labels, cumulative))
+        hits = {}
+        for (name, labels), value in counters.items():
+            if name == CACHE:
+                labels = dict(labels)
+                result = labels.pop('result')
+                key = _labels(**labels)
+                hits.setdefault(key, {'hit': 0, 'miss': 0})[result] += value
+        for labels, counts in sorted(hits.items()):
+            total = counts['hit'] + counts['miss']
+            if total:
+                samples[CACHE_RATIO].append(
+                    _format(CACHE_RATIO, labels, counts['hit'] / total)
+                )
+        lines = []
+        for name, (kind, description) in HELP.items():
+            if samples[name]:
+                lines.append('# HELP %s %s' % (name, description))
+                lines.append('# TYPE %s %s' % (name, kind))
+                lines.extend(samples[name])
+        return '\n'.join(lines) + '\n'
+
+    def record(self, view, method, status, duration, counters):
+        """Метрики одного HTTP-запроса."""
+        if method not in METHODS:
+            method = 'other'
+        self.inc(REQUESTS, _labels(view=view, method=method, status=status))
+        self.observe(DURATION, _labels(view=view), duration)
+        self.observe(QUERIES, _labels(view=view), counters.get('sql', 0))
+        for result in ('hit', 'miss'):
+            count = counters.get('cache_' + result, 0)
+            if count:
+                self.inc(CACHE, _labels(view=view, result=result), count)
+        self.flush()
+
+
+registry = Registry()
+atexit.register(registry.flush, force=True)
+
+
+def _measured(content, counters, finish):
+    """Тело потокового ответа читает базу уже после middleware: его
+    запросы идут в счетчики того же запроса, а замер закрывается по
+    окончании или обрыве потока."""
+    chunks = iter(content)
+    try:
+        while True:
+            with stats.using(counters):
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+            yield chunk
+    finally:
+        finish()
+
+
+class MetricsMiddleware:
+    """Ставится первой: замер охватывает всю цепочку middleware.
+
+    SQL-запросы считаются через core.stats, без обертки профилировщика.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with stats.collect() as counters:
+            response = self.get_response(request)
+
+        def finish():
+            match = getattr(request, 'resolver_match', None)
+            registry.record(
+                match.view_name if match else 'unmatched', request.method,
+                response.status_code, time.perf_counter() - start, counters,
+            )
+
+        if response.streaming:
+            response.streaming_content = _measured(
+                response.streaming_content, counters, finish
+            )
+        else:
+            finish()
+        return response
@@ -0,0 +1,168 @@
+"""Профилирование запросов в продакшене.
+
+ProfilingMiddleware для доли запросов (REQUEST_PROFILING_SAMPLE_RATE)
+собирает время и число SQL-запросов, время рендера шаблонов, попадания
+и промахи кеша и прочие счетчики core.stats. Итог пишется одной
+JSON-строкой в логгер core.profiling и, если включен
+REQUEST_PROFILING_HEADER, в заголовок Server-Timing.
+
+Для запросов вне выборки middleware ничего не оборачивает: остаются
+вызов random() и постоянный счетчик SQL-запросов из core.stats.
+
+Рендер и кеш учитываются через бэкенды из этого модуля, они
+подключаются в TEMPLATES и CACHES.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache.backends import locmem, memcached
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import connections
+from django.template.backends import django as django_backend
+
+from core import stats
+
+HEADER = 'Server-Timing'
+
+logger = logging.getLogger('core.profiling')
+
+_MISSING = object()
+# Вложенные вызовы (render_to_string внутри рендера, get() внутри
+# get_many()) не должны учитываться дважды.
+_rendering = contextvars.ContextVar('profiling_rendering', default=False)
+_getting_many = contextvars.ContextVar('profiling_get_many', default=False)
+
+
+def _sql_timer(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.incr('sql_ms', (time.perf_counter() - start) * 1000)
+
+
+@contextlib.contextmanager
+def instrument():
+    """Счетчики core.stats и замер времени SQL на время блока.
+
+    Вложенный в collect() вызов отдает счетчики внешнего блока.
+    """
+    with stats.collect() as metrics, contextlib.ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_sql_timer))
+        yield metrics
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        if _rendering.get():
+            return super().render(context, request)
+        token = _rendering.set(True)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.incr('render_ms', (time.perf_counter() - start) * 1000)
+            _rendering.reset(token)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд DjangoTemplates, замеряющий время рендера."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return Template(template.template, self)
+
+
+class CacheStatsMixin:
+    """Считает попадания и промахи get() и get_many()."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if not _getting_many.get():
+            stats.incr('cache_miss' if value is _MISSING else 'cache_hit')
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        token = _getting_many.set(True)
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            _getting_many.reset(token)
+        stats.incr('cache_hit', len(found))
+        stats.incr('cache_miss', len(keys) - len(found))
+        return found
+
+
+class LocMemCache(CacheStatsMixin, locmem.LocMemCache):
+    """Кеш в памяти процесса.
+
+    Другие процессы его записей не видят, поэтому с OPTIONS['MAX_TIMEOUT']
+    любой ключ, даже бессрочный, живет не дольше этого числа секунд:
+    версии, сменённые в другом процессе, подхватываются с задержкой.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self.max_timeout = params.get('OPTIONS', {}).get('MAX_TIMEOUT')
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        expires = super().get_backend_timeout(timeout)
+        if self.max_timeout is None:
+            return expires
+        limit = time.time() + self.max_timeout
+        return limit if expires is None else min(expires, limit)
+
+
+class MemcachedCache(CacheStatsMixin, memcached.MemcachedCache):
+    pass
+
+
+def server_timing(metrics):
+    """Заголовок Server-Timing: name_ms - dur, name - desc."""
+    names = sorted({
+        name[:-3] if name.endswith('_ms') else name for name in metrics
+    })
+    entries = []
+    for name in names:
+        entry = name
+        if name + '_ms' in metrics:
+            entry += ';dur=%.1f' % metrics[name + '_ms']
+        if name in metrics:
+            entry += ';desc="%s"' % metrics[name]
+        entries.append(entry)
+    return ', '.join(entries)
+
+
+class ProfilingMiddleware:
+    """Ставится первой, чтобы замер охватывал всю цепочку middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 0)
+        if rate <= 0 or random.random() >= rate:
+            return self.get_response(request)
+        start = time.perf_counter()
+        with instrument() as metrics:
+            response = self.get_response(request)
+        metrics = dict(metrics, total_ms=(time.perf_counter() - start) * 1000)
+        if getattr(settings, 'REQUEST_PROFILING_HEADER', False):
+            response[HEADER] = server_timing(metrics)
+        logger.info(json.dumps(dict(
+            {name: round(value, 2) for name, value in metrics.items()},
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+        ), sort_keys=True))
+        return response
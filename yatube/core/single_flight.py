@@ -0,0 +1,98 @@
+"""Пересчет дорогих значений кеша одним воркером (single-flight).
+
+Значение хранится вместе со сроком свежести и временем его расчета.
+Когда значения нет, пересчитывает только тот, кто взял короткую
+блокировку (cache.add); остальные ждут его результат до
+SINGLE_FLIGHT_WAIT секунд. Устаревшее значение живет еще
+SINGLE_FLIGHT_STALE секунд: пока один воркер его обновляет, остальные
+сразу получают старую копию (stale-while-revalidate).
+
+Чтобы ключи, записанные одновременно, не истекали тоже одновременно,
+обновление начинается заранее с вероятностью, растущей к сроку
+(XFetch: now - delta * beta * ln(random) >= expires).
+"""
+import math
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import stats
+
+LOCK_KEY = 'flight-lock:%s'
+POLL_INTERVAL = 0.05
+
+
+def _should_refresh(expires, delta, now):
+    beta = settings.SINGLE_FLIGHT_BETA
+    # 1 - random() лежит в (0, 1]: логарифм не падает на нуле
+    return now - delta * beta * math.log(1 - random.random()) >= expires
+
+
+def _acquire(key):
+    token = uuid.uuid4().hex
+    if cache.add(LOCK_KEY % key, token, settings.SINGLE_FLIGHT_LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _release(key, token):
+    # блокировка могла истечь и достаться другому воркеру
+    if cache.get(LOCK_KEY % key) == token:
+        cache.delete(LOCK_KEY % key)
+
+
+def _compute(key, compute, timeout, token):
+    try:
+        start = time.perf_counter()
+        value = compute()
+        delta = time.perf_counter() - start
+        if value is not None:
+            cache.set(
+                key, (value, time.time() + timeout, delta),
+                timeout + settings.SINGLE_FLIGHT_STALE,
+            )
+        return value
+    finally:
+        if token is not None:
+            _release(key, token)
+
+
+def _wait(key):
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None or cache.get(LOCK_KEY % key) is None:
+            # готово, или воркер отпустил блокировку без значения
+            return entry
+    return None
+
+
+def get_or_set(key, compute, timeout):
+    """Значение key; при промахе его считает один compute() на всех.
+
+    compute() возвращает None, если результат кешировать нельзя: такой
+    результат отдается только тому, кто его посчитал.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires, delta = entry
+        if not _should_refresh(expires, delta, time.time()):
+            return value
+        token = _acquire(key)
+        if token is None:
+            # обновляет другой воркер: пока отдаем старую копию
+            stats.incr('flight_stale')
+            return value
+        return _compute(key, compute, timeout, token)
+    token = _acquire(key)
+    if token is None:
+        stats.incr('flight_wait')
+        entry = _wait(key)
+        if entry is not None:
+            return entry[0]
+    # не дождались: считаем сами, чтобы не отвечать ошибкой
+    return _compute(key, compute, timeout, token)
@@ -0,0 +1,45 @@
+"""Настройка соединений SQLite под конкурентную запись.
+
+- journal_mode=WAL: читатели не блокируют писателя и наоборот;
+- synchronous=NORMAL: в режиме WAL fsync только на контрольных точках;
+- busy_timeout: писатель ждет освобождения блокировки, а не падает
+  сразу с "database is locked";
+- mmap_size и cache_size: чтение страниц без лишних системных вызовов;
+- BEGIN IMMEDIATE в atomic: блокировка записи берется в начале
+  транзакции. Отложенная транзакция, которая сначала читает, а потом
+  пишет, при конфликте не ждет busy_timeout, а сразу получает ошибку.
+
+Включается настройкой SQLITE_TUNING.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def pragmas():
+    return [
+        ('journal_mode', 'wal'),
+        ('synchronous', 'normal'),
+        ('busy_timeout', settings.SQLITE_BUSY_TIMEOUT),
+        ('mmap_size', settings.SQLITE_MMAP_SIZE),
+        ('cache_size', settings.SQLITE_CACHE_SIZE),
+    ]
+
+
+def _begin_immediate(connection):
+    def start_transaction():
+        connection.cursor().execute('BEGIN IMMEDIATE')
+    return start_transaction
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_TUNING:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+    # atomic() в SQLite открывает транзакцию этим методом
+    connection._start_transaction_under_autocommit = (
+        _begin_immediate(connection)
+    )
@@ -0,0 +1,77 @@
+"""Счетчики в пределах одного запроса.
+
+Код приложения увеличивает их через incr(), а middleware из
+core.metrics и core.profiling собирают их через collect().
+
+Число SQL-запросов (sql) считает обертка, которая ставится на каждое
+соединение один раз при его открытии: вне collect() она обходится
+одним чтением ContextVar на запрос к базе.
+"""
+import contextlib
+import contextvars
+from collections import Counter
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+def incr(name, value=1):
+    stats = _stats.get()
+    if stats is not None:
+        stats[name] += value
+
+
+def current():
+    """Счетчики текущего запроса; вне запроса - пустые."""
+    return Counter(_stats.get() or ())
+
+
+def active():
+    return _stats.get() is not None
+
+
+def _count_sql(execute, sql, params, many, context):
+    incr('sql')
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def count_sql(sender, connection, **kwargs):
+    # В начало списка: connection.execute_wrapper() снимает последнюю
+    # обертку, и открытие соединения внутри него не должно ее подменить.
+    if _count_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _count_sql)
+
+
+@contextlib.contextmanager
+def collect():
+    """Включает счетчики внутри блока и отдает их.
+
+    Вложенный collect() отдает счетчики внешнего блока.
+    """
+    stats = _stats.get()
+    if stats is not None:
+        yield stats
+        return
+    stats = Counter()
+    token = _stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats.reset(token)
+
+
+@contextlib.contextmanager
+def using(stats):
+    """Делает stats текущими счетчиками внутри блока.
+
+    Нужен там, где код запроса выполняется после выхода из collect(),
+    например при чтении тела потокового ответа.
+    """
+    token = _stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats.reset(token)
@@ -0,0 +1,18 @@
+CHUNK_SIZE = 16 * 1024
+
+
+def buffered(parts, size=CHUNK_SIZE):
+    """Склеивает мелкие строки потокового ответа в куски по size байт.
+
+    Отправлять каждую строку отдельно - лишний вызов записи в сокет
+    на каждую запись; копить весь ответ - память под весь ответ.
+    """
+    buffer, length = [], 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield ''.join(buffer).encode()
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
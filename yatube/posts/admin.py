@@ -1,5 +1,10 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
+
+from core.streaming import buffered
+
 from .models import Post, Group
+from . import exporter, search
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -14,6 +19,37 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    actions = ('export_jsonl', 'export_csv')
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по text идет через полнотекстовый индекс, а не LIKE."""
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=search.post_ids(search_term)), False
+
+    def _export(self, queryset, fmt, kinds, filename):
+        response = StreamingHttpResponse(
+            buffered(exporter.export_lines(queryset, fmt, kinds)),
+            content_type=(
+                'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+            ),
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="%s"' % filename
+        )
+        return response
+
+    def export_jsonl(self, request, queryset):
+        return self._export(queryset, 'jsonl', (
+            exporter.POST, exporter.COMMENT,
+        ), 'posts.jsonl')
+    export_jsonl.short_description = (
+        'Выгрузить посты с комментариями (JSONL)'
+    )
+
+    def export_csv(self, request, queryset):
+        return self._export(queryset, 'csv', (exporter.POST,), 'posts.csv')
+    export_csv.short_description = 'Выгрузить посты (CSV)'
 
 
 admin.site.register(Post, PostAdmin)
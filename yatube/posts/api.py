@@ -0,0 +1,303 @@
+"""JSON API (подключается под api/v1/); писать можно только подписки.
+
+Ответы отдаются потоком: записи кодируются по мере чтения из базы,
+и страница целиком в памяти не собирается. Ленты листаются тем же
+курсором (pub_date, id), что и HTML-страницы.
+"""
+import json
+from collections.abc import Iterator
+from functools import partial, wraps
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+
+from core.db_router import use_primary
+from core.streaming import buffered
+
+from . import counters, follows, groups
+from .models import Comment, Group, Post
+from .paginators import CursorPaginator, InvalidCursor
+
+User = get_user_model()
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 500
+
+encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class BadRequest(Exception):
+    pass
+
+
+def iter_json(pairs):
+    """Кодирует JSON-объект из пар (ключ, значение) по частям.
+
+    Итератор в значении кодируется как массив поэлементно, callable
+    вызывается, когда до него дойдет очередь: так курсор следующей
+    страницы пишется после самих записей.
+    """
+    yield '{'
+    for index, (key, value) in enumerate(pairs):
+        if index:
+            yield ','
+        yield encoder.encode(key) + ':'
+        if callable(value):
+            value = value()
+        if not isinstance(value, Iterator):
+            yield encoder.encode(value)
+            continue
+        yield '['
+        for position, item in enumerate(value):
+            if position:
+                yield ','
+            yield encoder.encode(item)
+        yield ']'
+    yield '}'
+
+
+def json_stream(pairs):
+    return StreamingHttpResponse(
+        buffered(iter_json(pairs)), content_type='application/json'
+    )
+
+
+def error(detail, status):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def api_view(view=None, *, methods=('GET',)):
+    """Обработчик API (по умолчанию GET): ошибки запроса отдаются
+    как JSON."""
+    if view is None:
+        return partial(api_view, methods=methods)
+
+    @require_http_methods(methods)
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as problem:
+            return error(str(problem), 400)
+        except ObjectDoesNotExist:
+            return error('Не найдено.', 404)
+    return wrapper
+
+
+def author_data(user):
+    return {
+        'username': user.username,
+        'full_name': user.get_full_name(),
+    }
+
+
+def group_data(group):
+    if group is None:
+        return None
+    return {'slug': group.slug, 'title': group.title}
+
+
+def post_data(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': author_data(post.author),
+        'group': group_data(post.group),
+        'image': post.image.url if post.image else None,
+        'comments_count': post.comments_count,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'author': author_data(comment.author),
+        'text': comment.text,
+        'created': comment.created,
+    }
+
+
+def limit_from(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise BadRequest('limit должен быть числом.')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest('limit должен быть от 1 до %s.' % MAX_LIMIT)
+    return limit
+
+
+def page_pairs(request, queryset, serialize=post_data,
+               ordering=('-pub_date', '-id'), name='results'):
+    """Пары results/next/previous страницы по курсору из запроса.
+
+    name - ключ, под которым отдаются сами объекты.
+    """
+    paginator = CursorPaginator(queryset, limit_from(request), ordering)
+    try:
+        window, reverse, has_cursor = paginator.window(
+            request.GET.get('cursor')
+        )
+    except InvalidCursor:
+        raise BadRequest('Неверный курсор.')
+    page = {'first': None, 'last': None, 'has_more': False}
+
+    def results():
+        rows = window.iterator()
+        if reverse:
+            # назад страница читается в обратном порядке
+            rows = list(rows)
+            page['has_more'] = len(rows) > paginator.per_page
+            rows = reversed(rows[:paginator.per_page])
+        for position, obj in enumerate(rows):
+            if position == paginator.per_page:
+                page['has_more'] = True
+                break
+            if page['first'] is None:
+                page['first'] = obj
+            page['last'] = obj
+            yield serialize(obj)
+
+    def cursors():
+        if 'cursors' not in page:
+            page['cursors'] = paginator.cursors(
+                page['first'], page['last'], page['has_more'],
+                reverse, has_cursor,
+            )
+        return page['cursors']
+
+    return [
+        (name, results()),
+        ('next', lambda: cursors()[0]),
+        ('previous', lambda: cursors()[1]),
+    ]
+
+
+@api_view
+def feed(request):
+    """Лента всех постов."""
+    return json_stream(page_pairs(request, Post.objects.for_feed()))
+
+
+@api_view
+def group_feed(request, slug):
+    """Группа и ее посты."""
+    group = groups.get_by_slug(slug)
+    if group is None:
+        raise Group.DoesNotExist(slug)
+    return json_stream([
+        ('group', dict(group_data(group), description=group.description)),
+        *page_pairs(request, group.posts.for_feed()),
+    ])
+
+
+@api_view
+def profile(request, username):
+    """Автор со счетчиками и его посты."""
+    author = User.objects.select_related('stats').get(username=username)
+    stats = counters.stats_for(author)
+    return json_stream([
+        ('author', dict(
+            author_data(author),
+            posts_count=stats.posts_count,
+            followers_count=stats.followers_count,
+            following_count=stats.following_count,
+        )),
+        *page_pairs(request, author.posts.for_feed()),
+    ])
+
+
+@api_view
+def post_detail(request, post_id):
+    """Пост и страница его комментариев, старые сверху."""
+    post = Post.objects.for_feed().get(pk=post_id)
+    comments = Comment.objects.filter(post_id=post.pk).select_related(
+        'author'
+    )
+    return json_stream([
+        ('post', post_data(post)),
+        *page_pairs(
+            request, comments, comment_data, ('created', 'id'), 'comments'
+        ),
+    ])
+
+
+@api_view
+def posts_batch(request):
+    """Посты по списку ?ids=1,2,3 в порядке запроса."""
+    try:
+        ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk]
+    except ValueError:
+        raise BadRequest('ids - список чисел через запятую.')
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_LIMIT:
+        raise BadRequest('Не больше %s ids за раз.' % MAX_LIMIT)
+    posts = Post.objects.for_feed().in_bulk(ids) if ids else {}
+    return json_stream([
+        ('results', (post_data(posts[pk]) for pk in ids if pk in posts)),
+        ('missing', [pk for pk in ids if pk not in posts]),
+    ])
+
+
+@api_view
+def followers(request, username):
+    """Подписчики автора, новые сверху."""
+    author_id = User.objects.values_list('pk', flat=True).get(
+        username=username
+    )
+    return json_stream(page_pairs(
+        request, follows.followers(author_id),
+        lambda follow: author_data(follow.user), follows.ORDERING,
+    ))
+
+
+@api_view
+def following(request, username):
+    """Авторы, на которых подписан пользователь, новые сверху."""
+    user_id = User.objects.values_list('pk', flat=True).get(
+        username=username
+    )
+    return json_stream(page_pairs(
+        request, follows.following(user_id),
+        lambda follow: author_data(follow.author), follows.ORDERING,
+    ))
+
+
+def usernames_from(request, *names):
+    """Списки имен из JSON-тела или из полей формы."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            raise BadRequest('Тело запроса - не JSON.')
+        if not isinstance(data, dict):
+            raise BadRequest('Ожидается JSON-объект.')
+        lists = [data.get(name, []) for name in names]
+    else:
+        lists = [request.POST.getlist(name) for name in names]
+    for name, value in zip(names, lists):
+        if not isinstance(value, list) or not all(
+            isinstance(item, str) for item in value
+        ):
+            raise BadRequest('%s - список имен пользователей.' % name)
+    return lists
+
+
+@api_view(methods=['POST'])
+@use_primary
+def follow_bulk(request):
+    """Подписки и отписки пачкой: {"follow": [...], "unfollow": [...]}.
+
+    Все изменения применяются в одной транзакции.
+    """
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', 401)
+    follow, unfollow = usernames_from(request, 'follow', 'unfollow')
+    if set(follow) & set(unfollow):
+        raise BadRequest('Одно имя и в follow, и в unfollow.')
+    if len(follow) + len(unfollow) > follows.MAX_BULK:
+        raise BadRequest('Не больше %s имен за раз.' % follows.MAX_BULK)
+    return JsonResponse(follows.apply(request.user, follow, unfollow))
@@ -0,0 +1,17 @@
+from django.urls import path
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.feed, name='feed'),
+    path('posts/batch/', api.posts_batch, name='posts_batch'),
+    path('posts/<int:post_id>/', api.post_detail, name='post_detail'),
+    path('groups/<slug:slug>/', api.group_feed, name='group'),
+    path('profiles/<str:username>/', api.profile, name='profile'),
+    path('profiles/<str:username>/followers/', api.followers,
+         name='followers'),
+    path('profiles/<str:username>/following/', api.following,
+         name='following'),
+    path('follows/', api.follow_bulk, name='follows'),
+]
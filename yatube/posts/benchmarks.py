@@ -0,0 +1,212 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from . import counters, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Полный реалистичный объем; команды берут от него долю --scale.
+DATASET = {
+    'users': 10000,
+    'groups': 100,
+    'posts': 500000,
+    'comments': 2000000,
+    'follows': 200000,
+}
+BATCH_SIZE = 5000
+PASSWORD = 'bench-password'
+
+
+class Route:
+    """Маршрут для замера: имя, аргументы, клиент и бюджет запросов."""
+
+    def __init__(self, name, budget, kwargs=None, method='get',
+                 data=None, auth=False, setup=None, compare=None):
+        self.name = name
+        self.budget = budget
+        self.kwargs = kwargs or (lambda data: {})
+        self.method = method
+        self.data = data
+        self.auth = auth
+        self.setup = setup
+        # HTML-маршрут с теми же данными, с которым сравнивается API
+        self.compare = compare
+
+    def url(self, dataset):
+        return reverse(self.name, kwargs=self.kwargs(dataset))
+
+    def send(self, client, dataset):
+        """Выполняет запрос; потоковый ответ вычитывается целиком,
+        иначе его запросы к базе не попали бы в замер."""
+        data = self.data(dataset) if callable(self.data) else self.data
+        response = getattr(client, self.method)(self.url(dataset), data)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+
+def _unfollow(dataset):
+    Follow.objects.filter(
+        user=dataset.reader, author=dataset.author
+    ).delete()
+
+
+def _follow(dataset):
+    Follow.objects.get_or_create(user=dataset.reader, author=dataset.author)
+
+
+# Бюджеты - число SQL-запросов на холодный кеш страниц при странице
+# из 10 постов: для лент и поста он не зависит от размера страницы.
+ROUTES = [
+    Route('posts:index', 2),
+    Route('posts:group_list', 3,
+          kwargs=lambda data: {'slug': data.group.slug}),
+    Route('posts:group_directory', 1),
+    Route('posts:profile', 3,
+          kwargs=lambda data: {'username': data.author.username}),
+    # плюс поиск автора для версии страницы: с кешем он не повторяется
+    Route('posts:post_detail', 3,
+          kwargs=lambda data: {'post_id': data.post.pk}),
+    Route('posts:post_comments', 1,
+          kwargs=lambda data: {'post_id': data.post.pk}),
+    Route('posts:follow_index', 5, auth=True),
+    Route('posts:followers', 2,
+          kwargs=lambda data: {'username': data.author.username}),
+    Route('posts:following', 2,
+          kwargs=lambda data: {'username': data.reader.username}),
+    Route('posts:post_create', 3, auth=True),
+    Route('posts:post_edit', 4, auth=True,
+          kwargs=lambda data: {'post_id': data.own_post.pk}),
+    Route('posts:add_comment', 9, method='post', auth=True,
+          kwargs=lambda data: {'post_id': data.post.pk},
+          data={'text': 'Комментарий из замера'}),
+    # подписка и отписка проверяют переход порога знаменитости
+    Route('posts:profile_follow', 13, auth=True, setup=_unfollow,
+          kwargs=lambda data: {'username': data.author.username}),
+    Route('posts:profile_unfollow', 10, auth=True, setup=_follow,
+          kwargs=lambda data: {'username': data.author.username}),
+    # пачка: одна вставка и по UPDATE счетчиков на сторону
+    Route('api_v1:follows', 13, method='post', auth=True, setup=_unfollow,
+          data=lambda data: {'follow': [data.author.username]}),
+    Route('api_v1:followers', 2, data={'limit': 10},
+          compare='posts:followers',
+          kwargs=lambda data: {'username': data.author.username}),
+    Route('api_v1:feed', 1, data={'limit': 10}, compare='posts:index'),
+    Route('api_v1:group', 2, data={'limit': 10}, compare='posts:group_list',
+          kwargs=lambda data: {'slug': data.group.slug}),
+    Route('api_v1:profile', 2, data={'limit': 10}, compare='posts:profile',
+          kwargs=lambda data: {'username': data.author.username}),
+    Route('api_v1:post_detail', 2, compare='posts:post_detail',
+          kwargs=lambda data: {'post_id': data.post.pk}),
+    Route('api_v1:posts_batch', 1, data=lambda data: {
+        'ids': ','.join(str(pk) for pk in data.batch_ids),
+    }),
+]
+
+
+class Dataset:
+    """Объекты, на которые ссылаются маршруты замера."""
+
+    def __init__(self):
+        self.reader = User.objects.get(username='bench_reader')
+        self.author = Follow.objects.filter(
+            user=self.reader, author__posts__isnull=False
+        ).select_related('author').first().author
+        self.post = Post.objects.filter(author=self.author).order_by(
+            '-comments_count'
+        ).first()
+        self.own_post = Post.objects.filter(author=self.reader).first()
+        self.group = self.post.group or Group.objects.first()
+        self.batch_ids = list(Post.objects.filter(
+            author=self.author
+        ).values_list('pk', flat=True)[:10])
+
+
+def seed(scale, stdout=None):
+    """Заполняет базу пропорционально DATASET и восстанавливает
+    денормализованные данные, которые bulk_create не обновляет."""
+    sizes = {
+        name: max(int(size * scale), 2) for name, size in DATASET.items()
+    }
+    rng = random.Random(0)
+
+    def log(message):
+        if stdout:
+            stdout.write(message)
+
+    reader = User.objects.create_user('bench_reader', password=PASSWORD)
+    _bulk_create(User, (
+        User(username='bench_%s' % number,
+             first_name='Автор', last_name=str(number))
+        for number in range(sizes['users'])
+    ))
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    _bulk_create(Group, (
+        Group(title='Группа %s' % number, slug='bench-%s' % number,
+              description='Описание')
+        for number in range(sizes['groups'])
+    ))
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+    log('users: %s, groups: %s' % (len(user_ids), len(group_ids)))
+
+    _bulk_create(Post, (
+        Post(text='Пост %s' % number,
+             author_id=rng.choice(user_ids),
+             group_id=rng.choice(group_ids + [None]))
+        for number in range(sizes['posts'])
+    ))
+    Post.objects.create(text='Свой пост', author=reader)
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    log('posts: %s' % len(post_ids))
+
+    _bulk_create(Comment, (
+        Comment(text='Комментарий %s' % number,
+                post_id=rng.choice(post_ids),
+                author_id=rng.choice(user_ids))
+        for number in range(sizes['comments'])
+    ))
+    log('comments: %s' % sizes['comments'])
+
+    pairs = {
+        (reader.pk, author_id)
+        for author_id in rng.sample(user_ids, min(50, len(user_ids)))
+        if author_id != reader.pk
+    }
+    follows = min(sizes['follows'], len(user_ids) * (len(user_ids) - 1))
+    while len(pairs) < follows:
+        user_id, author_id = rng.sample(user_ids, 2)
+        pairs.add((user_id, author_id))
+    _bulk_create(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in pairs
+    ))
+    log('follows: %s' % len(pairs))
+
+    for ids in _chunks(user_ids):
+        counters.recount_authors(ids)
+    for ids in _chunks(post_ids):
+        counters.recount_posts(ids)
+    for user_id, author_id in pairs:
+        timeline.backfill(user_id, author_id)
+    log('counters and timelines rebuilt')
+
+
+def _chunks(ids, size=BATCH_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _bulk_create(model, objects):
+    """bulk_create пачками, не держа весь набор в памяти."""
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
@@ -0,0 +1,58 @@
+"""Карточки постов в лентах с кешем готового HTML.
+
+Ключ карточки - id поста и отпечаток всего, что в ней выводится
+(текст, дата, картинка, имя автора, группа). Любая правка дает новый
+ключ, поэтому сбрасывать кеш карточек не нужно, а старые записи
+вытесняются по сроку POST_CARD_CACHE_TIMEOUT.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import thumbnails
+
+TEMPLATE = 'posts/includes/post_card.html'
+GEOMETRY = '960x339'
+CARD_KEY = 'card:%s:%s'
+
+
+def card_key(post):
+    group = post.group
+    stamp = hashlib.md5('\0'.join([
+        post.text,
+        post.pub_date.isoformat(),
+        str(post.image),
+        post.author.username,
+        post.author.get_full_name(),
+        group.slug if group else '',
+    ]).encode()).hexdigest()
+    return CARD_KEY % (post.pk, stamp)
+
+
+def render_many(posts):
+    """HTML карточек в порядке posts.
+
+    Готовые карточки читаются одним get_many; для остальных миниатюры
+    разрешаются одним походом в хранилище. Карточки с заглушкой вместо
+    еще не нарезанной миниатюры не кешируются.
+    """
+    posts = list(posts)
+    keys = {post.pk: card_key(post) for post in posts}
+    cards = cache.get_many(list(keys.values()))
+    missing = [post for post in posts if keys[post.pk] not in cards]
+    if missing:
+        resolved = thumbnails.resolve_many(missing, GEOMETRY)
+        fresh = {}
+        for post in missing:
+            key = keys[post.pk]
+            thumbnail = resolved.get(post.pk)
+            cards[key] = render_to_string(
+                TEMPLATE, {'post': post, 'thumbnail': thumbnail}
+            )
+            if thumbnail is not None or not post.image:
+                fresh[key] = cards[key]
+        cache.set_many(fresh, settings.POST_CARD_CACHE_TIMEOUT)
+    return [mark_safe(cards[keys[post.pk]]) for post in posts]
@@ -0,0 +1,158 @@
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, GroupStats, Post
+
+AUTHOR_COUNTERS = (
+    'posts_count', 'comments_count', 'followers_count', 'following_count',
+)
+# модель, поле-автор и счетчик, который она питает
+AUTHOR_SOURCES = (
+    (Post, 'author', 'posts_count'),
+    (Comment, 'author', 'comments_count'),
+    (Follow, 'author', 'followers_count'),
+    (Follow, 'user', 'following_count'),
+)
+
+
+def change_author(user_id, **deltas):
+    """Атомарно меняет счетчики автора: UPDATE ... SET n = n + delta."""
+    updates = {name: F(name) + delta for name, delta in deltas.items()}
+    updated = AuthorStats.objects.filter(user_id=user_id).update(**updates)
+    # строку создаем только при росте: уменьшать у отсутствующей нечего,
+    # а при удалении пользователя она бы пережила каскад
+    if not updated and min(deltas.values()) > 0:
+        AuthorStats.objects.get_or_create(user_id=user_id)
+        AuthorStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def change_authors(user_ids, **deltas):
+    """change_author для пачки авторов одним UPDATE."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    updates = {name: F(name) + delta for name, delta in deltas.items()}
+    rows = AuthorStats.objects.filter(user_id__in=user_ids)
+    updated = rows.update(**updates)
+    if updated < len(user_ids) and min(deltas.values()) > 0:
+        missing = set(user_ids) - set(rows.values_list('user_id', flat=True))
+        AuthorStats.objects.bulk_create(
+            [AuthorStats(user_id=user_id) for user_id in missing],
+            ignore_conflicts=True,
+        )
+        AuthorStats.objects.filter(user_id__in=missing).update(**updates)
+
+
+def change_group(group_id, delta, pub_date=None):
+    """Число постов группы и время ее последнего поста.
+
+    При убыли последний пост мог уйти, поэтому время берется заново
+    по индексу (group, pub_date) в том же UPDATE; у пустой группы -
+    NULL.
+    """
+    updates = {'posts_count': F('posts_count') + delta}
+    if delta < 0:
+        updates['last_post_at'] = Subquery(Post.objects.filter(
+            group_id=group_id
+        ).order_by('-pub_date').values('pub_date')[:1])
+    elif pub_date is not None:
+        latest = Value(pub_date, output_field=models.DateTimeField())
+        updates['last_post_at'] = Greatest(
+            Coalesce('last_post_at', latest), latest
+        )
+    updated = GroupStats.objects.filter(group_id=group_id).update(**updates)
+    if not updated and delta > 0:
+        GroupStats.objects.get_or_create(group_id=group_id)
+        GroupStats.objects.filter(group_id=group_id).update(**updates)
+
+
+def change_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def stats_for(user):
+    """Счетчики автора; у пользователя без активности - нули.
+
+    Если счетчики подгружены через select_related('stats'),
+    запроса не будет.
+    """
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
+
+
+def _count_by(model, field, ids):
+    rows = model.objects.filter(**{field + '__in': ids}).values(
+        field
+    ).annotate(n=Count('id')).order_by()
+    return {row[field]: row['n'] for row in rows}
+
+
+@transaction.atomic
+def recount_authors(user_ids):
+    """Пересчитывает счетчики пачки авторов, возвращает число исправленных."""
+    actual = {
+        user_id: dict.fromkeys(AUTHOR_COUNTERS, 0) for user_id in user_ids
+    }
+    for model, field, counter in AUTHOR_SOURCES:
+        for user_id, count in _count_by(model, field, user_ids).items():
+            actual[user_id][counter] = count
+    current = AuthorStats.objects.select_for_update().in_bulk(user_ids)
+    created, changed = [], []
+    for user_id, values in actual.items():
+        stats = current.get(user_id)
+        if stats is None:
+            if any(values.values()):
+                created.append(AuthorStats(user_id=user_id, **values))
+            continue
+        if any(getattr(stats, name) != value
+               for name, value in values.items()):
+            for name, value in values.items():
+                setattr(stats, name, value)
+            changed.append(stats)
+    AuthorStats.objects.bulk_create(created)
+    AuthorStats.objects.bulk_update(changed, AUTHOR_COUNTERS)
+    return len(created) + len(changed)
+
+
+@transaction.atomic
+def recount_posts(post_ids):
+    """Пересчитывает comments_count пачки постов."""
+    actual = _count_by(Comment, 'post', post_ids)
+    changed = []
+    for post in Post.objects.filter(pk__in=post_ids).only('comments_count'):
+        count = actual.get(post.pk, 0)
+        if post.comments_count != count:
+            post.comments_count = count
+            changed.append(post)
+    Post.objects.bulk_update(changed, ['comments_count'])
+    return len(changed)
+
+
+@transaction.atomic
+def recount_groups(group_ids):
+    """Пересчитывает счетчики пачки групп, возвращает число исправленных."""
+    rows = Post.objects.filter(group__in=group_ids).values('group').annotate(
+        n=Count('id'), last=Max('pub_date'),
+    ).order_by()
+    actual = {group_id: (0, None) for group_id in group_ids}
+    actual.update((row['group'], (row['n'], row['last'])) for row in rows)
+    current = GroupStats.objects.select_for_update().in_bulk(group_ids)
+    created, changed = [], []
+    for group_id, (count, last) in actual.items():
+        stats = current.get(group_id)
+        if stats is None:
+            if count:
+                created.append(GroupStats(
+                    group_id=group_id, posts_count=count, last_post_at=last,
+                ))
+        elif (stats.posts_count, stats.last_post_at) != (count, last):
+            stats.posts_count, stats.last_post_at = count, last
+            changed.append(stats)
+    GroupStats.objects.bulk_create(created)
+    GroupStats.objects.bulk_update(changed, ['posts_count', 'last_post_at'])
+    return len(created) + len(changed)
@@ -0,0 +1,88 @@
+"""Потоковая выгрузка постов и комментариев в JSONL или CSV.
+
+Формат записей совпадает с тем, что читает import_yatube. Строки
+читаются через values_list(...).iterator(chunk_size), поэтому память
+не зависит от размера выгрузки, а первые байты уходят сразу.
+"""
+import csv
+import io
+import json
+
+from .models import Comment, Post
+
+POST = 'post'
+COMMENT = 'comment'
+FORMATS = ('jsonl', 'csv')
+CHUNK_SIZE = 2000
+FIELDS = {
+    POST: ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+    COMMENT: ('id', 'post', 'author', 'text', 'created'),
+}
+# значения выбираются одним запросом с JOIN вместо моделей
+COLUMNS = {
+    POST: ('id', 'author__username', 'group__slug', 'text', 'pub_date',
+           'image'),
+    COMMENT: ('id', 'post_id', 'author__username', 'text', 'created'),
+}
+
+
+def filter_posts(queryset=None, author=None, group=None, since=None,
+                 until=None):
+    """Посты для выгрузки: автор (username), группа (slug), даты."""
+    queryset = Post.objects.all() if queryset is None else queryset
+    if author:
+        queryset = queryset.filter(author__username=author)
+    if group:
+        queryset = queryset.filter(group__slug=group)
+    if since:
+        queryset = queryset.filter(pub_date__gte=since)
+    if until:
+        queryset = queryset.filter(pub_date__lt=until)
+    return queryset
+
+
+def records(posts, kinds=(POST, COMMENT), chunk_size=CHUNK_SIZE):
+    """Словари записей: сначала посты, затем их комментарии."""
+    sources = {
+        POST: posts.order_by('id'),
+        COMMENT: Comment.objects.filter(
+            post__in=posts.order_by().values('id')
+        ).order_by('id'),
+    }
+    for kind in kinds:
+        rows = sources[kind].values_list(*COLUMNS[kind])
+        for row in rows.iterator(chunk_size=chunk_size):
+            record = dict(zip(FIELDS[kind], row))
+            record['type'] = kind
+            for name in ('pub_date', 'created'):
+                if name in record:
+                    record[name] = record[name].isoformat()
+            yield record
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def csv_lines(records, kind):
+    """CSV с заголовком; в одном файле - записи одного вида."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(
+        buffer, FIELDS[kind], extrasaction='ignore', lineterminator='\n',
+    )
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_lines(posts, fmt, kinds=(POST, COMMENT), chunk_size=CHUNK_SIZE):
+    if fmt == 'csv':
+        kind, = kinds
+        return csv_lines(records(posts, kinds, chunk_size), kind)
+    return jsonl_lines(records(posts, kinds, chunk_size))
@@ -0,0 +1,77 @@
+"""Граф подписок в кеше: на кого подписан пользователь.
+
+Id авторов пользователя читаются из базы одним запросом и хранятся
+отсортированным array('q') - 8 байт на подписку, проверка бисекцией.
+Сигналы Follow сбрасывают его сразу и после коммита, как
+core.cache.invalidate: правка на месте терялась бы при откате и при
+одновременных загрузках.
+
+У подписанных больше чем на FOLLOW_GRAPH_LIMIT авторов массив не
+хранится: вместо него метка TOO_MANY, а ответы "подписан ли A на B"
+кешируются попарно. Так память на пользователя ограничена.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+KEY = 'following:%s'
+PAIR_KEY = 'follows:%s:%s'
+TOO_MANY = 'too-many'
+
+
+def _timeout():
+    return settings.FOLLOW_GRAPH_TIMEOUT
+
+
+def _position(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index, index < len(ids) and ids[index] == author_id
+
+
+def _load(user_id):
+    ids = cache.get(KEY % user_id)
+    if ids is None:
+        limit = settings.FOLLOW_GRAPH_LIMIT
+        rows = list(Follow.objects.filter(user_id=user_id).order_by(
+            'author_id'
+        ).values_list('author_id', flat=True)[:limit + 1])
+        ids = TOO_MANY if len(rows) > limit else array('q', rows)
+        cache.set(KEY % user_id, ids, _timeout())
+    return ids
+
+
+def following(user_id):
+    """Отсортированные id авторов пользователя.
+
+    None - подписок больше FOLLOW_GRAPH_LIMIT, читайте их из базы.
+    """
+    ids = _load(user_id)
+    return None if ids == TOO_MANY else ids
+
+
+def is_following(user_id, author_id):
+    """Подписан ли пользователь на автора."""
+    ids = _load(user_id)
+    if ids != TOO_MANY:
+        return _position(ids, author_id)[1]
+    key = PAIR_KEY % (user_id, author_id)
+    result = cache.get(key)
+    if result is None:
+        result = Follow.objects.filter(
+            user_id=user_id, author_id=author_id
+        ).exists()
+        cache.set(key, result, _timeout())
+    return result
+
+
+def changed(user_id, *author_ids):
+    """Сбрасывает граф пользователя после подписки или отписки."""
+    keys = [KEY % user_id]
+    keys += [PAIR_KEY % (user_id, author_id) for author_id in author_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
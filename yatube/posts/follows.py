@@ -0,0 +1,127 @@
+"""Списки подписчиков и подписок, подписки пачкой.
+
+Списки листаются курсором по id подписки (новые сверху) на индексах
+(author, -id) и (user, -id). Пачка не проходит цепочку сигналов Follow
+для каждой строки: вставка одна, счетчики меняются одним UPDATE на
+сторону, а подтягивание постов в ленту уходит в фоновые задачи.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from core.cache import invalidate
+from core.jobs import enqueue
+
+from . import counters, follow_graph, timeline
+from .models import Follow
+
+User = get_user_model()
+ORDERING = ('-id',)
+MAX_BULK = 100
+PERSON_FIELDS = ('username', 'first_name', 'last_name')
+
+_bulk = ContextVar('follows_bulk', default=False)
+
+
+def _only(side):
+    return ['id', side + '_id'] + [
+        '%s__%s' % (side, field) for field in PERSON_FIELDS
+    ]
+
+
+def followers(author_id):
+    """Подписки на автора вместе с подписчиками."""
+    return Follow.objects.filter(author_id=author_id).select_related(
+        'user'
+    ).only(*_only('user'))
+
+
+def following(user_id):
+    """Подписки пользователя вместе с авторами."""
+    return Follow.objects.filter(user_id=user_id).select_related(
+        'author'
+    ).only(*_only('author'))
+
+
+def in_bulk():
+    """Идет ли пачка apply: ее строки сигналы Follow пропускают."""
+    return _bulk.get()
+
+
+@contextmanager
+def _bulk_block():
+    token = _bulk.set(True)
+    try:
+        yield
+    finally:
+        _bulk.reset(token)
+
+
+def _followed(user, author_ids):
+    # на SQLite параллельная запись между чтением existing и вставкой
+    # откатит транзакцию, поэтому все вставленные строки - наши
+    Follow.objects.bulk_create(
+        [Follow(user=user, author_id=author_id) for author_id in author_ids],
+        ignore_conflicts=True,
+    )
+    counters.change_authors(author_ids, followers_count=1)
+    timeline.followers_changed(author_ids, 1)
+    for author_id in author_ids:
+        enqueue(timeline.backfill, user.pk, author_id)
+
+
+def _unfollowed(user, author_ids):
+    with _bulk_block():
+        Follow.objects.filter(user=user, author_id__in=author_ids).delete()
+    counters.change_authors(author_ids, followers_count=-1)
+    timeline.followers_changed(author_ids, -1)
+    timeline.prune(user.pk, *author_ids)
+
+
+def apply(user, follow=(), unfollow=()):
+    """Подписывает user на авторов из follow и отписывает от unfollow.
+
+    Принимает имена пользователей, возвращает, что изменилось: уже
+    существующие подписки, подписка на себя и отписка от тех, на кого
+    user не подписан, пропускаются.
+    """
+    follow = list(dict.fromkeys(follow))
+    unfollow = list(dict.fromkeys(unfollow))
+    authors = dict(User.objects.filter(
+        username__in=follow + unfollow
+    ).values_list('username', 'pk'))
+    result = {
+        'followed': [],
+        'unfollowed': [],
+        'missing': [
+            name for name in follow + unfollow if name not in authors
+        ],
+    }
+    with transaction.atomic():
+        existing = set(Follow.objects.filter(
+            user=user, author_id__in=authors.values()
+        ).values_list('author_id', flat=True))
+        result['followed'] = [
+            name for name in follow
+            if authors.get(name) not in (None, user.pk, *existing)
+        ]
+        result['unfollowed'] = [
+            name for name in unfollow if authors.get(name) in existing
+        ]
+        changed = result['followed'] + result['unfollowed']
+        if not changed:
+            return result
+        if result['followed']:
+            _followed(user, [authors[name] for name in result['followed']])
+        if result['unfollowed']:
+            _unfollowed(
+                user, [authors[name] for name in result['unfollowed']]
+            )
+        delta = len(result['followed']) - len(result['unfollowed'])
+        if delta:
+            counters.change_author(user.pk, following_count=delta)
+        follow_graph.changed(user.pk, *(authors[name] for name in changed))
+        invalidate(*('author:%s' % name for name in [user.username, *changed]))
+    return result
@@ -1,8 +1,31 @@
 from django import forms
+from django.forms.models import ModelChoiceIterator
+
+from .groups import all_groups
 from .models import Post, Comment
 
 
+class CachedGroupIterator(ModelChoiceIterator):
+    """Варианты групп из кеша: страница с формой не ходит в базу."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for group in all_groups():
+            yield self.choice(group)
+
+    def __len__(self):
+        return len(all_groups()) + (self.field.empty_label is not None)
+
+
 class PostForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        group = self.fields['group']
+        group.iterator = CachedGroupIterator
+        # виджет получил варианты при создании поля
+        group.widget.choices = group.choices
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
@@ -0,0 +1,34 @@
+"""Фрагменты страниц постов для текущего пользователя (core.holes)."""
+from django.template.loader import render_to_string
+
+from core.holes import register
+
+from . import follow_graph
+from .forms import CommentForm
+
+
+@register('follow_button')
+def follow_button(request, username, author_id):
+    following = request.user.is_authenticated and (
+        follow_graph.is_following(request.user.pk, author_id))
+    return render_to_string('posts/includes/follow_button.html', {
+        'username': username, 'following': following,
+    }, request=request)
+
+
+@register('post_edit_link')
+def post_edit_link(request, post_id, author_id):
+    if request.user.pk != author_id:
+        return ''
+    return render_to_string('posts/includes/post_edit_link.html', {
+        'post_id': post_id,
+    }, request=request)
+
+
+@register('comment_form')
+def comment_form(request, post_id):
+    # Гостю шаблон формы не выводит, но рендерится и для него:
+    # форма комментария должна оставаться в контексте страницы поста.
+    return render_to_string('posts/includes/comment_form.html', {
+        'post_id': post_id, 'form': CommentForm(),
+    }, request=request)
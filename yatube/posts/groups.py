@@ -0,0 +1,71 @@
+"""Метаданные групп в кеше: по slug, по id и общий список.
+
+Группы меняются редко, поэтому хранятся без срока и сбрасываются
+сигналами Group (posts.signals). Счетчики каталога (GroupStats) сюда
+не входят: они меняются с каждым постом.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Group
+
+SLUG_KEY = 'group-slug:%s'
+ID_KEY = 'group-id:%s'
+ALL_KEY = 'groups:all'
+
+
+def _slug_key(slug):
+    # slug может быть не ASCII, а ключи memcached - только ASCII
+    return SLUG_KEY % hashlib.md5(slug.encode()).hexdigest()
+
+
+def _remember(group):
+    cache.set_many(
+        {_slug_key(group.slug): group, ID_KEY % group.pk: group}, None
+    )
+    return group
+
+
+def get_by_slug(slug):
+    """Группа по slug или None."""
+    group = cache.get(_slug_key(slug))
+    if group is None:
+        group = Group.objects.filter(slug=slug).first()
+        if group is not None:
+            _remember(group)
+    return group
+
+
+def get_many(ids):
+    """{id: группа} для существующих из ids одним get_many."""
+    keys = {ID_KEY % pk: pk for pk in ids}
+    found = {
+        keys[key]: group for key, group in cache.get_many(keys).items()
+    }
+    missing = [pk for pk in keys.values() if pk not in found]
+    if missing:
+        for group in Group.objects.filter(pk__in=missing):
+            found[group.pk] = _remember(group)
+    return found
+
+
+def all_groups():
+    """Все группы по названию: варианты выбора в PostForm."""
+    groups = cache.get(ALL_KEY)
+    if groups is None:
+        groups = list(Group.objects.order_by('title'))
+        cache.set(ALL_KEY, groups, None)
+    return groups
+
+
+def forget(group, *slugs):
+    """Сбрасывает группу сразу и после коммита, как core.cache.invalidate.
+
+    slugs - прежние slug группы, если он менялся.
+    """
+    keys = [_slug_key(slug) for slug in {group.slug, *slugs}]
+    keys += [ID_KEY % group.pk, ALL_KEY]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
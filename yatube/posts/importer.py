@@ -0,0 +1,457 @@
+"""Потоковый импорт постов, комментариев и подписок (import_yatube).
+
+Записи читаются из JSONL или CSV построчно и вставляются пачками через
+bulk_create. Авторы и группы ищутся через ограниченный LRU-кеш, так
+что память не растет с размером файла. На время загрузки снимаются
+триггеры поискового индекса и вторичные индексы лент; после загрузки
+они, счетчики и ленты подписок перестраиваются. Состояние пишется
+в файл контрольной точки после каждой пачки, и прерванный импорт
+продолжается с места остановки.
+"""
+import csv
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+POST = 'post'
+COMMENT = 'comment'
+FOLLOW = 'follow'
+KINDS = (POST, COMMENT, FOLLOW)
+# индексы лент, которые дешевле построить заново, чем вести при вставке
+DEFERRED_INDEX_MODELS = (Post, Comment)
+REBUILD_STEPS = ('indexes', 'search', 'counters', 'timelines', 'cache')
+REQUIRED = {
+    POST: ('text', 'author'),
+    COMMENT: ('post', 'author', 'text'),
+    FOLLOW: ('user', 'author'),
+}
+
+
+class CheckpointMismatch(Exception):
+    pass
+
+
+class LRUCache:
+    """Ограниченный словарь: при переполнении вытесняется самый старый."""
+
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+
+    def get(self, key):
+        if key not in self.items:
+            return None
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.size:
+            self.items.popitem(last=False)
+
+
+class Resolver:
+    """Имя -> id через LRU-кеш; недостающие объекты создаются пачкой."""
+
+    def __init__(self, model, field, factory, size):
+        self.model = model
+        self.field = field
+        self.factory = factory
+        self.cache = LRUCache(size)
+
+    def _query(self, names):
+        return dict(self.model.objects.filter(
+            **{self.field + '__in': names}
+        ).values_list(self.field, 'id'))
+
+    def resolve(self, names):
+        resolved, missing = {}, []
+        for name in set(names):
+            pk = self.cache.get(name)
+            if pk is None:
+                missing.append(name)
+            else:
+                resolved[name] = pk
+        if missing:
+            found = self._query(missing)
+            new = [name for name in missing if name not in found]
+            if new:
+                self.model.objects.bulk_create(
+                    [self.factory(name) for name in new],
+                    ignore_conflicts=True,
+                )
+                found.update(self._query(new))
+            for name, pk in found.items():
+                self.cache.put(name, pk)
+            resolved.update(found)
+        return resolved
+
+
+def _new_user(username):
+    # войти импортированный автор сможет после сброса пароля
+    return User(username=username, password=make_password(None))
+
+
+def _new_group(slug):
+    return Group(slug=slug, title=slug, description='')
+
+
+def _json_record(line, kind):
+    """Запись из строки JSONL; битая строка или не объект - None,
+    такая запись попадает в skipped."""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    record.setdefault('type', kind)
+    return record
+
+
+def read_records(path, fmt, kind, offset):
+    """Записи файла, начиная с байта offset: (запись, offset после нее)."""
+    with open(path, 'rb') as source:
+        if fmt == 'csv':
+            header = source.readline()
+            offset = max(offset, len(header))
+            fieldnames = next(csv.reader([header.decode('utf-8-sig')]))
+        source.seek(offset)
+        position = [offset]
+
+        def lines():
+            for line in source:
+                position[0] += len(line)
+                yield line
+
+        if fmt == 'csv':
+            rows = csv.DictReader(
+                (line.decode('utf-8') for line in lines()),
+                fieldnames=fieldnames,
+            )
+            for row in rows:
+                yield dict(row, type=kind), position[0]
+            return
+        for line in lines():
+            if line.strip():
+                yield _json_record(line, kind), position[0]
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError('дата %r не в формате ISO 8601' % value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _pk(value):
+    return int(value) if value not in (None, '') else None
+
+
+def insert_as_is(model, objs):
+    """bulk_create(ignore_conflicts=True), не трогающий значения полей.
+
+    bulk_create заменяет даты auto_now_add текущим временем. Здесь
+    объекты вставляются raw, как их пишет loaddata: даты из файла,
+    проставленные объектам, сохраняются, а сами поля модели не меняются.
+    """
+    fields = model._meta.concrete_fields
+    for group in (
+        [obj for obj in objs if obj.pk is not None],
+        [obj for obj in objs if obj.pk is None],
+    ):
+        if not group:
+            continue
+        group_fields = fields if group[0].pk is not None else [
+            field for field in fields if field != model._meta.pk
+        ]
+        size = max(connection.ops.bulk_batch_size(group_fields, group), 1)
+        for start in range(0, len(group), size):
+            model._base_manager._insert(
+                group[start:start + size], group_fields,
+                raw=True, ignore_conflicts=True,
+            )
+
+
+class Checkpoint:
+    """Состояние импорта в JSON-файле; запись атомарна (os.replace)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as stored:
+            return json.load(stored)
+
+    def save(self, state):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as stored:
+            json.dump(state, stored)
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Importer:
+    def __init__(self, path, fmt, kind=None, batch_size=5000,
+                 cache_size=100000, checkpoint=None, log=None,
+                 progress_every=5.0):
+        self.path = os.path.abspath(path)
+        self.fmt = fmt
+        self.kind = kind
+        self.batch_size = batch_size
+        self.checkpoint = Checkpoint(checkpoint or path + '.checkpoint')
+        self.log = log or (lambda message: None)
+        self.progress_every = progress_every
+        self.users = Resolver(User, 'username', _new_user, cache_size)
+        self.groups = Resolver(Group, 'slug', _new_group, cache_size)
+
+    def run(self):
+        state = self.checkpoint.load()
+        if state is None:
+            state = {
+                'input': self.path, 'offset': 0, 'phase': 'load',
+                'counts': dict.fromkeys(KINDS + ('skipped',), 0),
+                'triggers': None, 'done': [],
+            }
+        elif state['input'] != self.path:
+            raise CheckpointMismatch(
+                'Контрольная точка %s относится к %s' % (
+                    self.checkpoint.path, state['input'])
+            )
+        else:
+            self.log('Продолжаем с байта %s, этап %s' % (
+                state['offset'], state['phase']))
+        if state['phase'] == 'load':
+            if state['triggers'] is None:
+                state['triggers'] = self.disable_triggers()
+                self.drop_indexes()
+                self.checkpoint.save(state)
+            try:
+                self.load(state)
+            except Exception:
+                self.restore(state)
+                raise
+            state['phase'] = 'rebuild'
+            self.checkpoint.save(state)
+        for step in REBUILD_STEPS:
+            if step not in state['done']:
+                self.log('Перестройка: %s' % step)
+                getattr(self, 'rebuild_' + step)(state)
+                state['done'].append(step)
+                self.checkpoint.save(state)
+        self.checkpoint.remove()
+        return state['counts']
+
+    def load(self, state):
+        counts = state['counts']
+        started = time.monotonic()
+        reported = started
+        imported_before = sum(counts[kind] for kind in KINDS)
+        batch = []
+        for record, offset in read_records(
+            self.path, self.fmt, self.kind, state['offset']
+        ):
+            batch.append(record)
+            if len(batch) < self.batch_size:
+                continue
+            self.save_batch(batch, offset, state)
+            batch = []
+            now = time.monotonic()
+            if now - reported >= self.progress_every:
+                reported = now
+                self.report(counts, imported_before, now - started)
+        if batch:
+            self.save_batch(batch, offset, state)
+        self.report(counts, imported_before, time.monotonic() - started)
+
+    def report(self, counts, imported_before, elapsed):
+        imported = sum(counts[kind] for kind in KINDS) - imported_before
+        self.log(
+            'постов: %(post)s, комментариев: %(comment)s, '
+            'подписок: %(follow)s, пропущено: %(skipped)s' % counts
+            + ' (%.0f записей/с)' % (imported / max(elapsed, 0.001))
+        )
+
+    def save_batch(self, batch, offset, state):
+        with transaction.atomic():
+            inserted = self.insert(batch)
+        for kind, count in inserted.items():
+            state['counts'][kind] += count
+        state['offset'] = offset
+        self.checkpoint.save(state)
+
+    def insert(self, records):
+        """Вставляет пачку; возвращает число записей каждого вида.
+
+        Записи без обязательных полей или с неверными значениями
+        пропускаются и попадают в счетчик skipped.
+        """
+        by_kind = {kind: [] for kind in KINDS}
+        for record in records:
+            kind = record and record.get('type')
+            if kind in REQUIRED and all(
+                record.get(field) not in (None, '')
+                for field in REQUIRED[kind]
+            ):
+                by_kind[kind].append(record)
+        users = self.users.resolve(
+            [record['author'] for rows in by_kind.values()
+             for record in rows]
+            + [record['user'] for record in by_kind[FOLLOW]]
+        )
+        groups = self.groups.resolve(
+            [record['group'] for record in by_kind[POST]
+             if record.get('group')]
+        )
+        posts = self._build(by_kind[POST], lambda record: Post(
+            id=_pk(record.get('id')),
+            text=record['text'],
+            author_id=users[record['author']],
+            group_id=groups.get(record.get('group')),
+            pub_date=_date(record.get('pub_date')),
+            image=record.get('image') or '',
+        ))
+        # до комментариев: они могут ссылаться на посты этой же пачки
+        insert_as_is(Post, posts)
+        comments = self._build(by_kind[COMMENT], lambda record: Comment(
+            id=_pk(record.get('id')),
+            post_id=_pk(record['post']),
+            author_id=users[record['author']],
+            text=record['text'],
+            created=_date(record.get('created')),
+        ))
+        existing = set(Post.objects.filter(
+            pk__in={comment.post_id for comment in comments}
+        ).values_list('pk', flat=True))
+        comments = [
+            comment for comment in comments if comment.post_id in existing
+        ]
+        insert_as_is(Comment, comments)
+        follows = [
+            follow for follow in self._build(
+                by_kind[FOLLOW], lambda record: Follow(
+                    user_id=users[record['user']],
+                    author_id=users[record['author']],
+                )
+            )
+            if follow.user_id != follow.author_id
+        ]
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        inserted = {
+            POST: len(posts), COMMENT: len(comments), FOLLOW: len(follows),
+        }
+        inserted['skipped'] = len(records) - sum(inserted.values())
+        return inserted
+
+    @staticmethod
+    def _build(records, factory):
+        objects = []
+        for record in records:
+            try:
+                objects.append(factory(record))
+            except (TypeError, ValueError):
+                continue
+        return objects
+
+    def restore(self, state):
+        """Возвращает индексы и триггеры поиска после ошибки загрузки,
+        чтобы сайт не работал без них до повторного запуска. Повторный
+        запуск снимет их снова и продолжит с контрольной точки.
+        """
+        self.log('Загрузка прервана: возвращаем индексы и триггеры')
+        self.rebuild_indexes(state)
+        self.rebuild_search(state)
+        state['triggers'] = None
+        self.checkpoint.save(state)
+
+    def disable_triggers(self):
+        """Снимает триггеры поискового индекса, возвращает их SQL."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger'"
+            )
+            triggers = [
+                (name, sql) for name, sql in cursor.fetchall()
+                if name.startswith(search.TABLE + '_')
+            ]
+            for name, _ in triggers:
+                cursor.execute('DROP TRIGGER %s' % name)
+        return [sql for _, sql in triggers]
+
+    def _existing_indexes(self, model):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            ))
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model in DEFERRED_INDEX_MODELS:
+                existing = self._existing_indexes(model)
+                for index in model._meta.indexes:
+                    if index.name in existing:
+                        editor.remove_index(model, index)
+
+    def rebuild_indexes(self, state):
+        with connection.schema_editor() as editor:
+            for model in DEFERRED_INDEX_MODELS:
+                existing = self._existing_indexes(model)
+                for index in model._meta.indexes:
+                    if index.name not in existing:
+                        editor.add_index(model, index)
+
+    def rebuild_search(self, state):
+        for _ in search.reindex(self.batch_size):
+            pass
+        with connection.cursor() as cursor:
+            for sql in state['triggers']:
+                cursor.execute(sql)
+
+    def rebuild_counters(self, state):
+        call_command(
+            'recount', chunk_size=self.batch_size, stdout=io.StringIO()
+        )
+
+    def rebuild_timelines(self, state):
+        """Заполняет ленты по всем подпискам; ключ последней
+        обработанной подписки сохраняется в контрольной точке."""
+        last = state.get('timeline_follow', 0)
+        while True:
+            pairs = list(Follow.objects.filter(pk__gt=last).order_by(
+                'pk'
+            ).values_list('pk', 'user_id', 'author_id')[:self.batch_size])
+            if not pairs:
+                return
+            for _, user_id, author_id in pairs:
+                timeline.backfill(user_id, author_id)
+            last = state['timeline_follow'] = pairs[-1][0]
+            self.checkpoint.save(state)
+
+    def rebuild_cache(self, state):
+        # версии всех областей разом: после импорта устарело почти все
+        cache.clear()
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from core.benchmark import measure
+from posts.models import Post
+from posts.paginators import NEXT, CursorPaginator
+from posts.views import NUMBER_OF_POST
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку первой и глубокой страницы ленты '
+        'в нумерованном режиме и в режиме курсора.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100010)
+        parser.add_argument('--page', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Не откатывать созданные для замера записи.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['posts'], options['batch_size'])
+                self.run(options['page'], options['repeat'])
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, total, batch_size):
+        author, _ = User.objects.get_or_create(username='bench_author')
+        missing = total - Post.objects.count()
+        for start in range(0, max(missing, 0), batch_size):
+            Post.objects.bulk_create(
+                Post(text='bench %s' % number, author=author)
+                for number in range(start, min(start + batch_size, missing))
+            )
+
+    def run(self, page_number, repeat):
+        queryset = Post.objects.all()
+        paginator = Paginator(queryset, NUMBER_OF_POST)
+        cursors = CursorPaginator(queryset, NUMBER_OF_POST)
+        boundary = queryset.order_by(*cursors.ordering)[
+            (page_number - 1) * NUMBER_OF_POST - 1
+        ]
+        deep_cursor = cursors.encode_cursor(boundary, NEXT)
+        cases = {
+            ('numbered', 1): lambda: list(Paginator(
+                queryset, NUMBER_OF_POST).page(1)),
+            ('numbered', page_number): lambda: list(Paginator(
+                queryset, NUMBER_OF_POST).page(page_number)),
+            ('cursor', 1): lambda: list(cursors.page()),
+            ('cursor', page_number): lambda: list(cursors.page(deep_cursor)),
+        }
+        self.stdout.write('posts: %s' % paginator.count)
+        for (mode, number), func in cases.items():
+            timing = measure(func, repeat=repeat)
+            self.stdout.write(
+                '%-8s page %-6s p50 %8.3f ms  p95 %8.3f ms' % (
+                    mode, number, timing['p50'], timing['p95'])
+            )
@@ -0,0 +1,110 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+
+from core.benchmark import QueryCounter, find_regressions, measure
+from posts import benchmarks
+
+# страницы замеряются без кеша: бюджеты задаются для холодного пути
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу реалистичными данными, проверяет бюджет SQL-запросов '
+        'каждого маршрута posts и записывает p50/p95 в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=float, default=0.01,
+            help='Доля от полного набора (10k пользователей, 500k постов, '
+                 '2M комментариев, 200k подписок).',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', default='bench_routes.json')
+        parser.add_argument(
+            '--compare', metavar='BASELINE',
+            help='JSON прошлого прогона: сообщить о регрессиях.',
+        )
+        parser.add_argument('--tolerance', type=float, default=0.2)
+        parser.add_argument('--keep', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                benchmarks.seed(options['scale'], self.stdout)
+                with override_settings(DEBUG=False, CACHES=NO_CACHE):
+                    results = self.run(options['repeat'])
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+        self.stdout.write('Результаты записаны в %s' % options['output'])
+        problems = [
+            '%s: %s запросов при бюджете %s' % (
+                name, result['queries'], result['budget'])
+            for name, result in results.items()
+            if result['queries'] > result['budget']
+        ]
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                problems += find_regressions(
+                    results, json.load(baseline), options['tolerance']
+                )
+        if problems:
+            raise CommandError('\n'.join(problems))
+
+    def run(self, repeat):
+        dataset = benchmarks.Dataset()
+        guest = Client()
+        reader = Client()
+        reader.force_login(dataset.reader)
+        results = {}
+        for route in benchmarks.ROUTES:
+            client = reader if route.auth else guest
+            url = route.url(dataset)
+
+            def request():
+                return route.send(client, dataset)
+
+            def setup():
+                if route.setup:
+                    route.setup(dataset)
+
+            setup()
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                response = request()
+            if response.status_code >= 400:
+                raise CommandError(
+                    '%s вернул %s' % (url, response.status_code))
+            timing = measure(request, repeat=repeat, setup=setup)
+            results[route.name] = dict(
+                timing, queries=queries.count, budget=route.budget,
+            )
+            self.stdout.write(
+                '%-24s queries %3s/%-3s p50 %8.3f ms  p95 %8.3f ms' % (
+                    route.name, queries.count, route.budget,
+                    timing['p50'], timing['p95'])
+            )
+        for route in benchmarks.ROUTES:
+            if route.compare in results:
+                html = results[route.compare]
+                api = results[route.name]
+                self.stdout.write(
+                    '%-24s p50 %8.3f ms против %s %8.3f ms (x%.1f)' % (
+                        route.name, api['p50'], route.compare,
+                        html['p50'], html['p50'] / max(api['p50'], 0.001))
+                )
+        return results
@@ -0,0 +1,188 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.test import override_settings
+
+from core.benchmark import percentile
+from posts.models import AuthorStats, Comment, Post
+
+User = get_user_model()
+ALIAS = 'bench_sqlite'
+USERS = 20
+POSTS = 200
+
+
+def seed():
+    User.objects.using(ALIAS).bulk_create(
+        User(username='stress%s' % number) for number in range(USERS)
+    )
+    users = list(User.objects.using(ALIAS).values_list('id', flat=True))
+    AuthorStats.objects.using(ALIAS).bulk_create(
+        AuthorStats(user_id=user_id) for user_id in users
+    )
+    Post.objects.using(ALIAS).bulk_create(
+        Post(text='Пост %s' % number, author_id=random.choice(users))
+        for number in range(POSTS)
+    )
+    return users
+
+
+def add_comment(users):
+    """Как add_comment: чтение поста, затем запись в одной транзакции."""
+    with transaction.atomic(using=ALIAS):
+        post_id = Post.objects.using(ALIAS).filter(
+            pk__lte=random.randint(1, POSTS)
+        ).values_list('pk', flat=True).first()
+        Comment.objects.using(ALIAS).bulk_create([Comment(
+            post_id=post_id, author_id=random.choice(users), text='Ок',
+        )])
+        Post.objects.using(ALIAS).filter(pk=post_id).update(
+            comments_count=F('comments_count') + 1
+        )
+
+
+def create_post(users):
+    """Как post_create: пост и счетчик автора в одной транзакции."""
+    author_id = random.choice(users)
+    with transaction.atomic(using=ALIAS):
+        AuthorStats.objects.using(ALIAS).get(user_id=author_id)
+        Post.objects.using(ALIAS).bulk_create([
+            Post(text='Новый пост', author_id=author_id)
+        ])
+        AuthorStats.objects.using(ALIAS).filter(user_id=author_id).update(
+            posts_count=F('posts_count') + 1
+        )
+
+
+def read_feed(users):
+    list(Post.objects.using(ALIAS).select_related('author')[:10])
+
+
+class Worker(threading.Thread):
+    def __init__(self, operations, users, deadline):
+        super().__init__()
+        self.operations = operations
+        self.users = users
+        self.deadline = deadline
+        self.timings = []
+        self.locked = 0
+
+    def run(self):
+        try:
+            while time.perf_counter() < self.deadline:
+                operation = random.choice(self.operations)
+                start = time.perf_counter()
+                try:
+                    operation(self.users)
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    self.locked += 1
+                    continue
+                self.timings.append(time.perf_counter() - start)
+        finally:
+            connections[ALIAS].close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Стресс-тест SQLite: потоки-писатели (комментарии и посты) и '
+        'читатели ленты на копии схемы. Сравнивает пропускную способность '
+        'и долю ошибок "database is locked" без настройки core.sqlite и '
+        'с ней.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument(
+            '--mode', choices=('both', 'before', 'after'), default='both',
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            template = os.path.join(directory, 'template.sqlite3')
+            # схема создается без настройки, чтобы файл остался
+            # в журнальном режиме по умолчанию
+            with override_settings(SQLITE_TUNING=False):
+                self.connect(template)
+                call_command('migrate', database=ALIAS, verbosity=0)
+                users = seed()
+                self.disconnect()
+            modes = {
+                'both': (False, True), 'before': (False,), 'after': (True,),
+            }[options['mode']]
+            for tuned in modes:
+                path = os.path.join(directory, 'run%s.sqlite3' % int(tuned))
+                shutil.copy(template, path)
+                with override_settings(SQLITE_TUNING=tuned):
+                    self.connect(path)
+                    try:
+                        self.report(tuned, self.run(users, options))
+                    finally:
+                        self.disconnect()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def connect(self, path):
+        connections.databases[ALIAS] = dict(
+            connections.databases['default'], NAME=path,
+        )
+
+    def disconnect(self):
+        connections[ALIAS].close()
+        del connections[ALIAS]
+        del connections.databases[ALIAS]
+
+    def run(self, users, options):
+        deadline = time.perf_counter() + options['seconds']
+        writers = [
+            Worker((add_comment, create_post), users, deadline)
+            for _ in range(options['writers'])
+        ]
+        readers = [
+            Worker((read_feed,), users, deadline)
+            for _ in range(options['readers'])
+        ]
+        for worker in writers + readers:
+            worker.start()
+        for worker in writers + readers:
+            worker.join()
+        return {
+            name: {
+                'done': sum(len(worker.timings) for worker in workers),
+                'locked': sum(worker.locked for worker in workers),
+                'timings': [
+                    timing for worker in workers for timing in worker.timings
+                ],
+                'seconds': options['seconds'],
+            }
+            for name, workers in (('writes', writers), ('reads', readers))
+        }
+
+    def report(self, tuned, results):
+        self.stdout.write(
+            'core.sqlite %s' % ('включен' if tuned else 'выключен')
+        )
+        for name, result in results.items():
+            attempts = result['done'] + result['locked']
+            self.stdout.write(
+                '  %-6s %8.1f/с  locked %5.1f%%  p95 %8.3f ms' % (
+                    name,
+                    result['done'] / result['seconds'],
+                    100 * result['locked'] / attempts if attempts else 0,
+                    percentile(sorted(result['timings']), 0.95) * 1000
+                    if result['timings'] else 0,
+                )
+            )
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from core.streaming import buffered
+from posts import exporter
+
+
+def moment(value):
+    """ISO-дата или дата со временем; без зоны - в текущей."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError('Неверная дата: %s' % value)
+        parsed = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты и комментарии в JSONL или CSV потоком, '
+        'в формате import_yatube.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', help='username автора.')
+        parser.add_argument('--group', help='slug группы.')
+        parser.add_argument('--since', help='С даты, включая.')
+        parser.add_argument('--until', help='До даты.')
+        parser.add_argument('--format', choices=exporter.FORMATS,
+                            default='jsonl')
+        parser.add_argument(
+            '--type', choices=(exporter.POST, exporter.COMMENT),
+            help='Только посты или только комментарии (для CSV '
+                 'обязательно).',
+        )
+        parser.add_argument('--output', help='Файл; по умолчанию stdout.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=exporter.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['format'] == 'csv' and not options['type']:
+            raise CommandError('Для CSV нужен --type.')
+        kinds = (
+            (options['type'],) if options['type']
+            else (exporter.POST, exporter.COMMENT)
+        )
+        posts = exporter.filter_posts(
+            author=options['author'], group=options['group'],
+            since=options['since'] and moment(options['since']),
+            until=options['until'] and moment(options['until']),
+        )
+        lines = exporter.export_lines(
+            posts, options['format'], kinds, options['chunk_size'],
+        )
+        if not options['output']:
+            for chunk in buffered(lines):
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in buffered(lines):
+                output.write(chunk)
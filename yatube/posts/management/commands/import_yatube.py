@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты, комментарии и подписки из JSONL или CSV пачками '
+        'с контрольными точками; повторный запуск продолжает прерванный.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='По умолчанию - по расширению файла.',
+        )
+        parser.add_argument(
+            '--type', choices=importer.KINDS,
+            help='Вид записей CSV-файла; в JSONL - для строк без "type".',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--cache-size', type=int, default=100000,
+            help='Сколько авторов и групп держать в памяти.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки, по умолчанию PATH.checkpoint.',
+        )
+        parser.add_argument('--progress-every', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or (
+            'csv' if options['path'].endswith('.csv') else 'jsonl'
+        )
+        if fmt == 'csv' and not options['type']:
+            raise CommandError('Для CSV нужен --type.')
+        try:
+            counts = importer.Importer(
+                options['path'], fmt, options['type'],
+                batch_size=options['batch_size'],
+                cache_size=options['cache_size'],
+                checkpoint=options['checkpoint'],
+                log=self.stdout.write,
+                progress_every=options['progress_every'],
+            ).run()
+        except (importer.CheckpointMismatch, OSError) as error:
+            raise CommandError(error)
+        self.stdout.write(
+            'Готово: постов %(post)s, комментариев %(comment)s, '
+            'подписок %(follow)s, пропущено %(skipped)s' % counts
+        )
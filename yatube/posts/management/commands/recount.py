@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import counters
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def chunks(queryset, size):
+    """Первичные ключи пачками по возрастанию, без OFFSET."""
+    last = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last).order_by('pk')
+            .values_list('pk', flat=True)[:size]
+        )
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики авторов, постов и групп, исправляя '
+        'расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        size = options['chunk_size']
+        fixed_authors = sum(
+            counters.recount_authors(ids)
+            for ids in chunks(User.objects.all(), size)
+        )
+        fixed_posts = sum(
+            counters.recount_posts(ids)
+            for ids in chunks(Post.objects.all(), size)
+        )
+        fixed_groups = sum(
+            counters.recount_groups(ids)
+            for ids in chunks(Group.objects.all(), size)
+        )
+        self.stdout.write(
+            'Исправлено авторов: %s, постов: %s, групп: %s' % (
+                fixed_authors, fixed_posts, fixed_groups,
+            )
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        totals = {}
+        for kind, total in search.reindex(options['chunk_size']):
+            totals[kind] = total
+            self.stdout.write('%s: %s' % (kind, total))
+        self.stdout.write(
+            'Проиндексировано постов: %s, комментариев: %s' % (
+                totals.get(search.POST, 0), totals.get(search.COMMENT, 0),
+            )
+        )
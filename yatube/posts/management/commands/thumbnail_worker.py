@@ -0,0 +1,103 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import F
+
+from core.cache import invalidate
+from posts import thumbnails, timeline
+from posts.models import ThumbnailTask
+from posts.signals import post_scopes
+
+MAX_ATTEMPTS = 3
+
+
+def _generate(image):
+    try:
+        thumbnails.generate(image)
+    except Exception as error:
+        return '%s: %s' % (type(error).__name__, error)
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Нарезает миниатюры из очереди пулом процессов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='0 - нарезать в текущем процессе.',
+        )
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=5.0)
+        parser.add_argument(
+            '--sweep-interval', type=float, default=600.0,
+            help='Как часто искать картинки без миниатюр и без задачи.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать текущую очередь и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        pool = None
+        if options['processes']:
+            # дочерние процессы не должны делить соединения родителя
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                max_workers=options['processes'], initializer=django.setup
+            )
+        swept = None
+        try:
+            while True:
+                if (swept is None or time.monotonic() - swept
+                        >= options['sweep_interval']):
+                    swept = time.monotonic()
+                    self.sweep(options['batch_size'])
+                done = self.process(pool, options['batch_size'])
+                if not done:
+                    if options['once']:
+                        return
+                    time.sleep(options['interval'])
+        finally:
+            if pool:
+                pool.shutdown()
+
+    def sweep(self, batch_size):
+        queued = thumbnails.sweep(batch_size)
+        if queued:
+            self.stdout.write('Поставлено в очередь: %s' % queued)
+
+    def process(self, pool, batch_size):
+        # исчерпавшие попытки задачи остаются, чтобы sweep их не вернул
+        tasks = list(ThumbnailTask.objects.filter(
+            attempts__lt=MAX_ATTEMPTS
+        ).select_related('post')[:batch_size])
+        if not tasks:
+            return 0
+        images = [task.post.image.name for task in tasks]
+        if pool:
+            errors = list(pool.map(_generate, images))
+        else:
+            errors = [_generate(image) for image in images]
+        finished, failed = [], []
+        for task, error in zip(tasks, errors):
+            if error is None:
+                finished.append(task.pk)
+                # страницы с заглушкой вместо картинки больше не актуальны
+                invalidate(*post_scopes(task.post))
+                timeline.touch(task.post.author_id)
+                continue
+            self.stderr.write('%s: %s' % (task.post.image.name, error))
+            failed.append(task.pk)
+        ThumbnailTask.objects.filter(pk__in=finished).delete()
+        ThumbnailTask.objects.filter(pk__in=failed).update(
+            attempts=F('attempts') + 1
+        )
+        self.stdout.write('Нарезано: %s, ошибок: %s' % (
+            errors.count(None), len(tasks) - errors.count(None),
+        ))
+        return len(tasks)
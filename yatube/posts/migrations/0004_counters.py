@@ -0,0 +1,63 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    db = schema_editor.connection.alias
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    counts = {}
+    for model, field, counter in (
+        (Post, 'author', 'posts_count'),
+        (Comment, 'author', 'comments_count'),
+        (Follow, 'author', 'followers_count'),
+        (Follow, 'user', 'following_count'),
+    ):
+        rows = model.objects.using(db).values(field).annotate(n=Count('id'))
+        for row in rows.order_by().iterator():
+            counts.setdefault(row[field], {})[counter] = row['n']
+    AuthorStats.objects.using(db).bulk_create(
+        AuthorStats(user_id=user_id, **values)
+        for user_id, values in counts.items()
+        if User.objects.using(db).filter(pk=user_id).exists()
+    )
+    for row in Comment.objects.using(db).values('post').annotate(
+        n=Count('id')
+    ).order_by().iterator():
+        Post.objects.using(db).filter(pk=row['post']).update(
+            comments_count=row['n']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0003_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.IntegerField(default=0, verbose_name='Постов')),
+                ('comments_count', models.IntegerField(default=0, verbose_name='Комментариев')),
+                ('followers_count', models.IntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.IntegerField(default=0, verbose_name='Подписок')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
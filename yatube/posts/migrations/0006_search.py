@@ -0,0 +1,51 @@
+from django.db import migrations
+
+# rowid: id * 2 для поста, id * 2 + 1 для комментария (см. posts.search)
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "text, kind UNINDEXED, post_id UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_search_post_insert AFTER INSERT ON posts_post "
+    "BEGIN INSERT INTO posts_search(rowid, text, kind, post_id) "
+    "VALUES (new.id * 2, new.text, 'post', new.id); END",
+    "CREATE TRIGGER posts_search_post_update AFTER UPDATE OF text "
+    "ON posts_post BEGIN UPDATE posts_search SET text = new.text "
+    "WHERE rowid = new.id * 2; END",
+    "CREATE TRIGGER posts_search_post_delete AFTER DELETE ON posts_post "
+    "BEGIN DELETE FROM posts_search WHERE rowid = old.id * 2; END",
+    "CREATE TRIGGER posts_search_comment_insert AFTER INSERT "
+    "ON posts_comment BEGIN "
+    "INSERT INTO posts_search(rowid, text, kind, post_id) "
+    "VALUES (new.id * 2 + 1, new.text, 'comment', new.post_id); END",
+    "CREATE TRIGGER posts_search_comment_update AFTER UPDATE OF text "
+    "ON posts_comment BEGIN UPDATE posts_search SET text = new.text "
+    "WHERE rowid = new.id * 2 + 1; END",
+    "CREATE TRIGGER posts_search_comment_delete AFTER DELETE "
+    "ON posts_comment BEGIN "
+    "DELETE FROM posts_search WHERE rowid = old.id * 2 + 1; END",
+    "INSERT INTO posts_search(rowid, text, kind, post_id) "
+    "SELECT id * 2, text, 'post', id FROM posts_post",
+    "INSERT INTO posts_search(rowid, text, kind, post_id) "
+    "SELECT id * 2 + 1, text, 'comment', post_id FROM posts_comment",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER posts_search_comment_delete',
+    'DROP TRIGGER posts_search_comment_update',
+    'DROP TRIGGER posts_search_comment_insert',
+    'DROP TRIGGER posts_search_post_delete',
+    'DROP TRIGGER posts_search_post_update',
+    'DROP TRIGGER posts_search_post_insert',
+    'DROP TABLE posts_search',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_thumbnail_tasks'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
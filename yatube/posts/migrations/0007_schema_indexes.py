@@ -0,0 +1,73 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:34
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def dedupe_follows(apps, schema_editor):
+    """Оставляет по одной подписке на пару и чинит счетчики."""
+    db = schema_editor.connection.alias
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    duplicates = Follow.objects.using(db).values('user', 'author').annotate(
+        n=Count('id'), keep=Min('id'),
+    ).filter(n__gt=1).order_by()
+    users, authors = set(), set()
+    for row in duplicates.iterator():
+        Follow.objects.using(db).filter(
+            user_id=row['user'], author_id=row['author'],
+        ).exclude(pk=row['keep']).delete()
+        users.add(row['user'])
+        authors.add(row['author'])
+    for ids, field, counter in (
+        (authors, 'author', 'followers_count'),
+        (users, 'user', 'following_count'),
+    ):
+        for stats in AuthorStats.objects.using(db).filter(pk__in=ids):
+            setattr(stats, counter, Follow.objects.using(db).filter(
+                **{field: stats.pk}
+            ).count())
+            stats.save(using=db, update_fields=[counter])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_search'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ['-pub_date', '-id']},
+        ),
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='timeline_user_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created', 'id'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-id'], name='timeline_user_date_idx'),
+        ),
+        migrations.RunPython(dedupe_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
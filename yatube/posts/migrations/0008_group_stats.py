@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:20
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def fill_group_stats(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Post = apps.get_model('posts', 'Post')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    rows = Post.objects.using(db).filter(group__isnull=False).values(
+        'group'
+    ).annotate(n=Count('id'), last=Max('pub_date')).order_by()
+    GroupStats.objects.using(db).bulk_create(
+        GroupStats(group_id=row['group'], posts_count=row['n'],
+                   last_post_at=row['last'])
+        for row in rows.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_schema_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group')),
+                ('posts_count', models.IntegerField(default=0, verbose_name='Постов')),
+                ('last_post_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний пост')),
+            ],
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
@@ -21,6 +21,25 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """Готовые проекции постов под каждый вид страницы."""
+
+    def for_feed(self):
+        """Карточки лент: автор и группа одним JOIN, без лишних полей."""
+        return self.select_related('author', 'group').only(
+            'id', 'text', 'pub_date', 'image', 'comments_count',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__title', 'group__slug',
+        )
+
+    def for_detail(self):
+        """Страница поста: автор со счетчиками и группа.
+
+        Комментарии читаются отдельно страницами по (created, id).
+        """
+        return self.select_related('author__stats', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -49,13 +68,33 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self) -> str:
         # выводим текст поста
         return self.text[:15]
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        # ленты читаются по убыванию (pub_date, id) целиком, по автору
+        # и по группе; id в индексе избавляет от досортировки
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx',
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -78,6 +117,14 @@ class Comment(models.Model):
         auto_now_add=True,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -92,3 +139,114 @@ class Follow(models.Model):
         related_name='following',
         on_delete=models.CASCADE,
     )
+
+    class Meta:
+        # списки подписчиков и подписок листаются по id, новые сверху
+        indexes = [
+            models.Index(fields=['user', '-id'], name='follow_user_idx'),
+            models.Index(fields=['author', '-id'], name='follow_author_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счетчики автора, обновляемые при каждом изменении."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.IntegerField(default=0, verbose_name='Постов')
+    comments_count = models.IntegerField(
+        default=0,
+        verbose_name='Комментариев',
+    )
+    followers_count = models.IntegerField(
+        default=0,
+        verbose_name='Подписчиков',
+    )
+    following_count = models.IntegerField(
+        default=0,
+        verbose_name='Подписок',
+    )
+
+    class Meta:
+        # знаменитости (posts.timeline) ищутся по числу подписчиков
+        indexes = [
+            models.Index(
+                fields=['followers_count'], name='author_followers_idx'
+            ),
+        ]
+
+
+class GroupStats(models.Model):
+    """Счетчики группы для каталога, обновляемые при каждом посте."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.IntegerField(default=0, verbose_name='Постов')
+    last_post_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Последний пост',
+    )
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост, разложенный подписчику."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        # ключ сортировки поста: ленту можно сливать с постами
+        ordering = ['-pub_date', '-post_id']
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_post_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_post'
+            ),
+        ]
+
+
+class ThumbnailTask(models.Model):
+    """Очередь предварительной нарезки миниатюр картинки поста."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnail_task',
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['id']
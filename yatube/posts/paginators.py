@@ -0,0 +1,208 @@
+import base64
+import json
+from collections.abc import Sequence
+
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(Sequence):
+    """Страница keyset-пагинации: без COUNT и без OFFSET."""
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по уникальному набору полей сортировки.
+
+    Курсор хранит значения полей сортировки граничного объекта,
+    поэтому страница любой глубины - это один индексный запрос
+    `WHERE (pub_date, id) < (...) ORDER BY ... LIMIT per_page + 1`.
+    """
+    cursor_based = True
+
+    def __init__(self, queryset, per_page, ordering=('-pub_date', '-id')):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        opts = queryset.model._meta
+        self.fields = [
+            opts.get_field(name.lstrip('-')) for name in self.ordering
+        ]
+
+    def encode_cursor(self, obj, direction):
+        values = [
+            field.value_to_string(obj) for field in self.fields
+        ]
+        payload = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(cursor.encode())
+            direction, values = json.loads(payload.decode())
+            if direction not in (NEXT, PREVIOUS):
+                raise ValueError(direction)
+            if len(values) != len(self.fields):
+                raise ValueError(values)
+            values = [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except Exception as error:
+            raise InvalidCursor(cursor) from error
+        return direction, values
+
+    def _boundary_filter(self, values, reverse):
+        """(f1, f2, ...) строго после values в заданном направлении."""
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            descending = name.startswith('-') != reverse
+            lookup = '%s__%s' % (name.lstrip('-'), 'lt' if descending
+                                 else 'gt')
+            equal = {
+                field.name: value for field, value in
+                zip(self.fields[:position], values[:position])
+            }
+            condition |= Q(**equal, **{lookup: values[position]})
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else '-' + name
+            for name in self.ordering
+        ]
+
+    def window(self, cursor=None):
+        """Запрос страницы (per_page + 1 строк) и направление курсора.
+
+        Лишняя строка показывает, есть ли записи дальше. При
+        направлении PREVIOUS строки идут в обратном порядке.
+        """
+        direction, values = NEXT, None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        reverse = direction == PREVIOUS
+        queryset = self.queryset.order_by(
+            *(self._reversed_ordering() if reverse else self.ordering)
+        )
+        if values is not None:
+            queryset = queryset.filter(self._boundary_filter(values, reverse))
+        return queryset[:self.per_page + 1], reverse, values is not None
+
+    def cursors(self, first, last, has_more, reverse, has_cursor):
+        """Курсоры соседних страниц по крайним объектам страницы."""
+        if reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, has_cursor
+        next_cursor = previous_cursor = None
+        if last is not None and has_next:
+            next_cursor = self.encode_cursor(last, NEXT)
+        if first is not None and has_previous:
+            previous_cursor = self.encode_cursor(first, PREVIOUS)
+        return next_cursor, previous_cursor
+
+    def page(self, cursor=None):
+        queryset, reverse, has_cursor = self.window(cursor)
+        rows = list(queryset)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+        next_cursor, previous_cursor = self.cursors(
+            rows[0] if rows else None, rows[-1] if rows else None,
+            has_more, reverse, has_cursor,
+        )
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def get_page(self, cursor=None):
+        """Как Paginator.get_page: битый курсор ведет на первую страницу."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+class MergedCursorPaginator:
+    """Keyset-пагинация по слиянию нескольких отсортированных выборок.
+
+    sources - пары (queryset, ordering) с одинаковыми по смыслу полями
+    сортировки, например (pub_date, post_id) записей ленты и
+    (pub_date, id) постов. Каждая выборка читается одним индексным
+    запросом не больше per_page + 1 строк под общим курсором, а
+    страница собирается слиянием в памяти.
+    """
+    cursor_based = True
+
+    def __init__(self, sources, per_page):
+        self.per_page = int(per_page)
+        self.paginators = [
+            CursorPaginator(queryset, per_page, ordering)
+            for queryset, ordering in sources
+        ]
+
+    def page(self, cursor=None):
+        rows = []
+        for paginator in self.paginators:
+            window, reverse, has_cursor = paginator.window(cursor)
+            rows.extend(
+                (tuple(
+                    field.value_from_object(obj)
+                    for field in paginator.fields
+                ), paginator, obj)
+                for obj in window
+            )
+        # все поля сортировки по убыванию; назад окна идут по возрастанию
+        rows.sort(key=lambda row: row[0], reverse=not reverse)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, has_cursor
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            _, paginator, obj = rows[-1]
+            next_cursor = paginator.encode_cursor(obj, NEXT)
+        if rows and has_previous:
+            _, paginator, obj = rows[0]
+            previous_cursor = paginator.encode_cursor(obj, PREVIOUS)
+        return CursorPage(
+            [obj for _, _, obj in rows], self, next_cursor, previous_cursor
+        )
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
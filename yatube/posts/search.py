@@ -0,0 +1,164 @@
+"""Полнотекстовый поиск по постам и комментариям (SQLite FTS5).
+
+Индекс posts_search создается миграцией 0006_search и обновляется
+триггерами на posts_post и posts_comment, поэтому в него попадают
+и массовые вставки мимо сигналов. rowid записи: id * 2 для поста
+и id * 2 + 1 для комментария.
+"""
+import base64
+import json
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .paginators import NEXT, PREVIOUS, CursorPage, InvalidCursor
+
+TABLE = 'posts_search'
+POST = 'post'
+COMMENT = 'comment'
+MAX_TERMS = 10
+
+# Пост выдачи - лучшее совпадение среди его текста и комментариев.
+# bm25 отрицательный: чем меньше, тем релевантнее.
+RANKED_SQL = (
+    'SELECT post_id, MIN(rank) AS score FROM posts_search '
+    'WHERE posts_search MATCH %s GROUP BY post_id'
+)
+POST_IDS_SQL = (
+    "SELECT post_id FROM posts_search "
+    "WHERE posts_search MATCH %s AND kind = 'post'"
+)
+REINDEX_SQL = {
+    POST: (
+        "INSERT OR REPLACE INTO posts_search(rowid, text, kind, post_id) "
+        "SELECT id * 2, text, 'post', id FROM posts_post "
+        "WHERE id > %s AND id <= %s"
+    ),
+    COMMENT: (
+        "INSERT OR REPLACE INTO posts_search(rowid, text, kind, post_id) "
+        "SELECT id * 2 + 1, text, 'comment', post_id FROM posts_comment "
+        "WHERE id > %s AND id <= %s"
+    ),
+}
+CHUNK_END_SQL = (
+    'SELECT MAX(id) FROM '
+    '(SELECT id FROM %s WHERE id > %%s ORDER BY id LIMIT %%s)'
+)
+SOURCE_TABLES = {POST: 'posts_post', COMMENT: 'posts_comment'}
+
+
+def match_expression(query):
+    """Запрос пользователя как выражение MATCH без синтаксиса FTS5.
+
+    Каждое слово берется в кавычки, последнее ищется по префиксу,
+    чтобы поиск работал и на недописанном слове.
+    """
+    terms = re.findall(r'\w+', query.lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    quoted = ['"%s"' % term for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def post_ids(query):
+    """Подзапрос id постов, в тексте которых есть все слова query."""
+    return RawSQL(POST_IDS_SQL, [match_expression(query) or '""'])
+
+
+class SearchPaginator:
+    """Keyset-пагинация выдачи по (релевантность, id поста)."""
+    cursor_based = True
+
+    def __init__(self, query, per_page, queryset=None):
+        self.match = match_expression(query)
+        self.per_page = int(per_page)
+        self.queryset = queryset if queryset is not None else (
+            Post.objects.for_feed()
+        )
+
+    def encode_cursor(self, row, direction):
+        payload = json.dumps([direction, list(row)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(cursor.encode())
+            direction, (post_id, score) = json.loads(payload.decode())
+            if direction not in (NEXT, PREVIOUS):
+                raise ValueError(direction)
+            values = [int(post_id), float(score)]
+        except Exception as error:
+            raise InvalidCursor(cursor) from error
+        return direction, values
+
+    def _rows(self, values, reverse):
+        sql, params = RANKED_SQL, [self.match]
+        if values is not None:
+            sql += ' HAVING (score, post_id) %s (%%s, %%s)' % (
+                '<' if reverse else '>'
+            )
+            params += [values[1], values[0]]
+        order = 'DESC' if reverse else 'ASC'
+        sql += ' ORDER BY score %s, post_id %s LIMIT %%s' % (order, order)
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def page(self, cursor=None):
+        if self.match is None:
+            return CursorPage([], self, None, None)
+        direction, values = NEXT, None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        reverse = direction == PREVIOUS
+        rows = self._rows(values, reverse)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1], NEXT)
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], PREVIOUS)
+        posts = self.queryset.in_bulk([post_id for post_id, _ in rows])
+        return CursorPage(
+            [posts[post_id] for post_id, _ in rows if post_id in posts],
+            self, next_cursor, previous_cursor,
+        )
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+def reindex(chunk_size=1000):
+    """Перестраивает индекс, перенося строки пачками внутри SQLite.
+
+    Генератор: после каждой пачки отдает (вид записи, сколько
+    перенесено всего), чтобы команда могла показывать прогресс.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM posts_search')
+    for kind, sql in REINDEX_SQL.items():
+        chunk_end_sql = CHUNK_END_SQL % SOURCE_TABLES[kind]
+        last, total = 0, 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(chunk_end_sql, [last, chunk_size])
+                end = cursor.fetchone()[0]
+                if end is None:
+                    break
+                cursor.execute(sql, [last, end])
+                total += cursor.rowcount
+            last = end
+            yield kind, total
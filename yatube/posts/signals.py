@@ -0,0 +1,130 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from core.cache import invalidate
+from core.jobs import enqueue
+
+from . import counters, follow_graph, follows, groups, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def author_scopes(*user_ids):
+    usernames = User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True
+    )
+    return ['author:%s' % username for username in usernames]
+
+
+def group_scopes(*group_ids):
+    return [
+        'group:%s' % group.slug
+        for group in groups.get_many(group_ids).values()
+    ]
+
+
+def post_scopes(post):
+    group_ids = {post.group_id, getattr(post, '_loaded_group_id', None)}
+    group_ids.discard(None)
+    return (
+        ['posts', 'post:%s' % post.pk]
+        + author_scopes(post.author_id)
+        + (group_scopes(*group_ids) + ['groups'] if group_ids else [])
+    )
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # группа могла смениться при правке: сбросим кеш и старой
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+
+
+def _move_between_groups(post, old_group_id):
+    if old_group_id == post.group_id:
+        return
+    if old_group_id is not None:
+        counters.change_group(old_group_id, -1)
+    if post.group_id is not None:
+        counters.change_group(post.group_id, 1, post.pub_date)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    invalidate(*post_scopes(instance))
+    _move_between_groups(
+        instance, None if created else instance._loaded_group_id
+    )
+    instance._loaded_group_id = instance.group_id
+    if created:
+        counters.change_author(instance.author_id, posts_count=1)
+        enqueue(timeline.fan_out, instance.pk)
+    else:
+        enqueue(timeline.touch, instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_author(instance.author_id, posts_count=-1)
+    if instance.group_id is not None:
+        counters.change_group(instance.group_id, -1)
+    invalidate(*post_scopes(instance))
+    enqueue(timeline.touch, instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post(instance.post_id, 1)
+        counters.change_author(instance.author_id, comments_count=1)
+        invalidate(
+            'post:%s' % instance.post_id, *author_scopes(instance.author_id)
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+    counters.change_author(instance.author_id, comments_count=-1)
+    invalidate(
+        'post:%s' % instance.post_id, *author_scopes(instance.author_id)
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created and not follows.in_bulk():
+        counters.change_author(instance.author_id, followers_count=1)
+        counters.change_author(instance.user_id, following_count=1)
+        timeline.followers_changed([instance.author_id], 1)
+        follow_graph.changed(instance.user_id, instance.author_id)
+        timeline.backfill(instance.user_id, instance.author_id)
+        invalidate(*author_scopes(instance.user_id, instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if follows.in_bulk():
+        return
+    counters.change_author(instance.author_id, followers_count=-1)
+    counters.change_author(instance.user_id, following_count=-1)
+    timeline.followers_changed([instance.author_id], -1)
+    follow_graph.changed(instance.user_id, instance.author_id)
+    timeline.prune(instance.user_id, instance.author_id)
+    invalidate(*author_scopes(instance.user_id, instance.author_id))
+
+
+@receiver(post_init, sender=Group)
+def remember_slug(sender, instance, **kwargs):
+    instance._loaded_slug = instance.__dict__.get('slug')
+
+
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # у группы из кеша post_init не вызывался
+    slugs = {instance.slug, getattr(instance, '_loaded_slug', None)} - {None}
+    groups.forget(instance, *slugs)
+    instance._loaded_slug = instance.slug
+    # при удалении группы посты теряют ссылку на нее без сигналов
+    invalidate(*('group:%s' % slug for slug in slugs), 'posts', 'groups')
@@ -0,0 +1,11 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(post, geometry):
+    """Готовая миниатюра или None: страница не ждет нарезки."""
+    return thumbnails.ready(post, geometry)
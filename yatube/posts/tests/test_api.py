@@ -0,0 +1,139 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+ALL_POST_NUMBER = 15
+LIMIT = 10
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой',
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание',
+        )
+        for i in range(ALL_POST_NUMBER):
+            Post.objects.create(
+                text='Пост %s' % i, author=cls.user, group=cls.group
+            )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'pk', flat=True
+            )
+        )
+        cls.post = Post.objects.get(pk=cls.expected[0])
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ок')
+
+    def setUp(self):
+        self.client = Client()
+
+    def get_json(self, name, kwargs=None, params=None, status=200):
+        response = self.client.get(reverse(name, kwargs=kwargs), params)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        if response.streaming:
+            return json.loads(b''.join(response.streaming_content))
+        return json.loads(response.content)
+
+    def test_feed_cursor_pagination(self):
+        """Лента листается курсором вперед и назад."""
+        first = self.get_json('api_v1:feed', params={'limit': LIMIT})
+        self.assertEqual(
+            [post['id'] for post in first['results']], self.expected[:LIMIT]
+        )
+        self.assertIsNone(first['previous'])
+        second = self.get_json(
+            'api_v1:feed', params={'limit': LIMIT, 'cursor': first['next']}
+        )
+        self.assertEqual(
+            [post['id'] for post in second['results']], self.expected[LIMIT:]
+        )
+        self.assertIsNone(second['next'])
+        back = self.get_json(
+            'api_v1:feed',
+            params={'limit': LIMIT, 'cursor': second['previous']},
+        )
+        self.assertEqual(back['results'], first['results'])
+
+    def test_feed_is_streamed(self):
+        """Лента отдается потоком."""
+        response = self.client.get(reverse('api_v1:feed'))
+        self.assertTrue(response.streaming)
+
+    def test_post_fields(self):
+        """Пост сериализуется с автором, группой и счетчиком."""
+        data = self.get_json(
+            'api_v1:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        self.assertEqual(data['post']['author'], {
+            'username': 'author', 'full_name': 'Лев Толстой',
+        })
+        self.assertEqual(data['post']['group'], {
+            'slug': 'test_slug', 'title': 'Тестовая группа',
+        })
+        self.assertEqual(data['post']['comments_count'], 1)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']], ['Ок']
+        )
+
+    def test_post_comments_are_paginated(self):
+        """Комментарии поста отдаются страницами по курсору."""
+        for number in range(LIMIT + 1):
+            Comment.objects.create(
+                post=self.post, author=self.user, text='Еще %s' % number
+            )
+        kwargs = {'post_id': self.post.pk}
+        first = self.get_json('api_v1:post_detail', kwargs=kwargs,
+                              params={'limit': LIMIT})
+        self.assertEqual(len(first['comments']), LIMIT)
+        self.assertEqual(first['comments'][0]['text'], 'Ок')
+        second = self.get_json(
+            'api_v1:post_detail', kwargs=kwargs,
+            params={'limit': LIMIT, 'cursor': first['next']},
+        )
+        self.assertEqual(
+            [comment['text'] for comment in second['comments']],
+            ['Еще %s' % (LIMIT - 1), 'Еще %s' % LIMIT],
+        )
+        self.assertIsNone(second['next'])
+
+    def test_group_and_profile(self):
+        """Группа и профиль отдаются вместе с постами."""
+        data = self.get_json('api_v1:group', kwargs={'slug': 'test_slug'})
+        self.assertEqual(data['group']['description'], 'Описание')
+        self.assertEqual(len(data['results']), ALL_POST_NUMBER)
+        data = self.get_json('api_v1:profile', kwargs={'username': 'author'})
+        self.assertEqual(data['author']['posts_count'], ALL_POST_NUMBER)
+        self.assertEqual(len(data['results']), ALL_POST_NUMBER)
+
+    def test_batch_keeps_order(self):
+        """Пакетный запрос сохраняет порядок ids и называет пропавшие."""
+        ids = [self.expected[3], 0, self.expected[1]]
+        data = self.get_json('api_v1:posts_batch', params={
+            'ids': ','.join(map(str, ids)),
+        })
+        self.assertEqual(
+            [post['id'] for post in data['results']], [ids[0], ids[2]]
+        )
+        self.assertEqual(data['missing'], [0])
+
+    def test_errors_are_json(self):
+        """Ошибки запроса и ненайденные объекты отдаются JSON."""
+        self.get_json('api_v1:post_detail', kwargs={'post_id': 0},
+                      status=404)
+        self.get_json('api_v1:profile', kwargs={'username': 'nobody'},
+                      status=404)
+        self.get_json('api_v1:feed', params={'limit': 0}, status=400)
+        self.get_json('api_v1:feed', params={'cursor': 'broken'},
+                      status=400)
+        self.get_json('api_v1:posts_batch', params={'ids': 'a,b'},
+                      status=400)
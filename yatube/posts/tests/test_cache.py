@@ -1,9 +1,14 @@
+import time
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
-from posts.models import Post, Group
+from django.test import Client, SimpleTestCase, TestCase
+from posts.models import Follow, Post, Group
 from django.core.cache import cache
 from django.urls import reverse
 
+from core.profiling import LocMemCache
+
 
 User = get_user_model()
 
@@ -13,6 +18,7 @@ class PostsCacheTest(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
         cls.group = Group.objects.create(
             title='Тестовая группа',
             slug='test_slug',
@@ -25,22 +31,81 @@ class PostsCacheTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
 
     def test_cache_index(self):
         """Проверка кеширования главной страницы"""
         response = self.authorized_client.get(reverse('posts:index'))
         content = response.content
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        response_old = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(response_old.content, content)
+        self.assertTemplateNotUsed(response_old, 'posts/index.html')
+        cache.clear()
+        response_new = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(response_new.content, content)
+
+    def test_new_post_invalidates_feeds(self):
+        """Новый пост сразу виден во всех лентах своих областей."""
+        Follow.objects.create(user=self.reader, author=self.user)
+        pages = [
+            (self.guest_client, reverse('posts:index')),
+            (self.guest_client, reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug})),
+            (self.guest_client, reverse(
+                'posts:profile', kwargs={'username': self.user})),
+            (self.reader_client, reverse('posts:follow_index')),
+        ]
+        for client, url in pages:
+            client.get(url)
         Post.objects.create(
             text='test_new_post',
             author=self.user,
+            group=self.group,
         )
-        response_old = self.authorized_client.get(reverse('posts:index'))
-        old_content = response_old.content
-        self.assertEqual(old_content, content)
-        cache.clear()
-        response_new = self.authorized_client.get(reverse('posts:index'))
-        new_content = response_new.content
-        self.assertNotEqual(old_content, new_content)
+        for client, url in pages:
+            with self.subTest(url=url):
+                self.assertContains(client.get(url), 'test_new_post')
+
+    def test_other_group_keeps_cache(self):
+        """Пост в другой группе не сбрасывает кеш чужой группы."""
+        other = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Описание',
+        )
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        Post.objects.create(text='Чужой пост', author=self.user, group=other)
+        self.assertTemplateNotUsed(
+            self.guest_client.get(url), 'posts/group_list.html'
+        )
+
+    def test_shared_page_has_own_header(self):
+        """Общая страница из кеша показывает в шапке текущего
+        пользователя."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'Пользователь: reader')
+
+
+class LocalCacheTest(SimpleTestCase):
+    def test_local_cache_caps_timeout(self):
+        """Кеш процесса не хранит ключи дольше MAX_TIMEOUT, даже
+        бессрочные: изменения других процессов подхватываются."""
+        local = LocMemCache('local-test', {'OPTIONS': {'MAX_TIMEOUT': 60}})
+        now = time.time()
+        with mock.patch('time.time', return_value=now):
+            local.set('forever', 1, None)
+            local.set('short', 1, 10)
+        with mock.patch('time.time', return_value=now + 30):
+            self.assertEqual(local.get_many(['forever', 'short']),
+                             {'forever': 1})
+        with mock.patch('time.time', return_value=now + 61):
+            self.assertIsNone(local.get('forever'))
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import cards
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+        )
+        for number in range(3):
+            Post.objects.create(
+                text='Пост %s' % number, author=cls.user, group=cls.group,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def posts(self):
+        return list(Post.objects.for_feed())
+
+    def test_cached_cards_cost_one_get_many(self):
+        """Страница из готовых карточек - один get_many без рендера."""
+        posts = self.posts()
+        first = cards.render_many(posts)
+        with mock.patch.object(cache, 'get_many',
+                               wraps=cache.get_many) as get_many, \
+                mock.patch('posts.cards.render_to_string') as render, \
+                self.assertNumQueries(0):
+            second = cards.render_many(posts)
+        self.assertEqual(get_many.call_count, 1)
+        render.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_edit_changes_card_key(self):
+        """Правка поста дает новый ключ, старая карточка не читается."""
+        post = self.posts()[0]
+        key = cards.card_key(post)
+        post.text = 'Исправленный текст'
+        post.save()
+        post = Post.objects.for_feed().get(pk=post.pk)
+        self.assertNotEqual(cards.card_key(post), key)
+        self.assertIn('Исправленный текст', cards.render_many([post])[0])
+
+    def test_pages_share_cards(self):
+        """Главная, группа, профиль и поиск выводят одну карточку."""
+        client = Client()
+        post = self.posts()[0]
+        card = cards.render_many([post])[0]
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:search') + '?q=%s' % post.text.split()[-1],
+        ):
+            with self.subTest(url=url):
+                self.assertContains(client.get(url), card)
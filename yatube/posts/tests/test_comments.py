@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.benchmark import QueryCounter
+from posts.models import Comment, Post
+from posts.views import COMMENTS_PER_PAGE
+
+User = get_user_model()
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text='Комментарий %s' % i)
+            for i in range(COMMENTS_PER_PAGE + 5)
+        )
+        cls.expected = list(
+            Comment.objects.order_by('created', 'id').values_list(
+                'text', flat=True
+            )
+        )
+        cls.url = reverse('posts:post_detail', kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_first_page_inline(self):
+        """На странице поста - первая страница комментариев по порядку."""
+        response = self.client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            self.expected[:COMMENTS_PER_PAGE],
+        )
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, comments.next_cursor)
+
+    def test_fragment_returns_next_page(self):
+        """Фрагмент отдает только HTML следующей страницы."""
+        cursor = self.client.get(self.url).context['comments'].next_cursor
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': cursor},
+        )
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            self.expected[COMMENTS_PER_PAGE:],
+        )
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'comments-more')
+
+    def test_fragment_of_missing_post_is_404(self):
+        """Фрагмент комментариев несуществующего поста - 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_queries_do_not_depend_on_comment_volume(self):
+        """Число запросов страницы поста не растет с числом комментариев."""
+        def count():
+            cache.clear()
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                self.client.get(self.url)
+            return queries.count
+
+        before = count()
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text='Еще')
+            for _ in range(100)
+        )
+        self.assertEqual(count(), before)
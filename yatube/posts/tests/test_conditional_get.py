@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.benchmark import QueryCounter
+from posts.models import Comment, Group, Post
+from posts.views import POST_AUTHOR_KEY
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user, group=cls.group,
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_counted(self, url, **headers):
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = self.client.get(url, **headers)
+        return response, queries.count
+
+    def test_not_modified_uses_at_most_one_query(self):
+        """Гостю 304 по ETag стоит не больше одного запроса."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                response, count = self.get_counted(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertLessEqual(count, 1)
+
+    def test_not_modified_for_logged_in_user(self):
+        """Вошедшему 304 стоит лишь чтения сессии и пользователя,
+        в том числе по ETag первого ответа, выдавшего CSRF-куку."""
+        self.client.force_login(self.user)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                response, count = self.get_counted(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertLessEqual(count, 2)
+
+    def test_if_modified_since(self):
+        """If-Modified-Since по Last-Modified тоже дает 304."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_post_detail_author_lookup(self):
+        """Без кеша автора страница поста проверяется одним запросом."""
+        url = self.urls[-1]
+        etag = self.client.get(url)['ETag']
+        cache.delete(POST_AUTHOR_KEY % self.post.pk)
+        response, count = self.get_counted(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(count, 1)
+
+    def test_changes_reset_validators(self):
+        """Новый пост и комментарий меняют ETag затронутых страниц."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        Post.objects.create(text='Новый', author=self.user, group=self.group)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, 200)
+        url = self.urls[-1]
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Ок')
+
+    def test_etag_depends_on_user(self):
+        """Другой пользователь не получает 304 по чужому ETag."""
+        etag = self.client.get(self.urls[0])['ETag']
+        self.client.force_login(self.user)
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.db_router import STICKY_COOKIE
+from posts.models import Post
+
+User = get_user_model()
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], CACHES=NO_CACHE)
+class ReplicaRouterTest(TransactionTestCase):
+    """Основная база - тестовая, реплика - отдельный файл SQLite,
+    который догоняет основную только по replicate()."""
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        handle, cls.replica_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        connections.databases['replica'] = dict(
+            connections.databases['default'],
+            NAME=cls.replica_path, TEST={},
+        )
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+        os.remove(cls.replica_path)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.replicate()
+
+    def replicate(self):
+        connections['replica'].close()
+        primary = connections['default']
+        primary.ensure_connection()
+        replica = sqlite3.connect(self.replica_path)
+        primary.connection.backup(replica)
+        replica.close()
+
+    def test_reads_go_to_replica(self):
+        """Чтения в запросе идут на реплику, пока она не догонит."""
+        Post.objects.create(text='Свежий пост', author=self.user)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(reverse('posts:index'))
+        self.assertTrue(replica.captured_queries)
+        self.assertNotContains(response, 'Свежий пост')
+        self.replicate()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_streamed_api_reads_replica(self):
+        """Потоковый ответ API читает реплику и после выхода из
+        middleware, не смешивая ее с основной базой."""
+        Post.objects.create(text='Свежий пост', author=self.user)
+        with CaptureQueriesContext(connections['replica']) as replica, \
+                CaptureQueriesContext(connections['default']) as primary:
+            response = self.client.get(reverse('api_v1:feed'))
+            body = b''.join(response.streaming_content).decode()
+        self.assertTrue(replica.captured_queries)
+        self.assertEqual(primary.captured_queries, [])
+        self.assertNotIn('Свежий пост', body)
+
+    def test_author_reads_own_writes(self):
+        """После записи автор читает основную базу и видит свой пост."""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Мой пост'}
+        )
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        profile = reverse('posts:profile', kwargs={'username': self.user})
+        self.assertContains(self.authorized_client.get(profile), 'Мой пост')
+        self.assertNotContains(self.client.get(profile), 'Мой пост')
+
+    def test_sticky_window_expires(self):
+        """По истечении окна чтения снова идут на реплику."""
+        Post.objects.create(text='Свежий пост', author=self.user)
+        self.client.cookies[STICKY_COOKIE] = '0'
+        self.assertNotContains(
+            self.client.get(reverse('posts:index')), 'Свежий пост'
+        )
+
+    def test_outside_request_uses_primary(self):
+        """Команды и фоновые задачи читают основную базу."""
+        self.assertEqual(Post.objects.all().db, 'default')
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import importer
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.other = User.objects.create_user(username='fedor')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classics', description='Описание',
+        )
+        cls.post = Post.objects.create(
+            text='Пост, с запятой', author=cls.author, group=cls.group,
+        )
+        cls.other_post = Post.objects.create(text='Чужой', author=cls.other)
+        Comment.objects.create(post=cls.post, author=cls.other, text='Ок')
+
+    def export(self, **options):
+        out = io.StringIO()
+        call_command('export_posts', stdout=out, **options)
+        return out.getvalue()
+
+    def test_jsonl_posts_then_comments(self):
+        """JSONL: посты автора, за ними их комментарии."""
+        lines = self.export(author='leo').splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record['type'] for record in records],
+                         ['post', 'comment'])
+        self.assertEqual(records[0]['group'], 'classics')
+        self.assertEqual(records[0]['author'], 'leo')
+        self.assertEqual(records[1]['post'], self.post.pk)
+
+    def test_filters(self):
+        """Фильтры по группе и датам."""
+        lines = self.export(group='classics', type='post').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines],
+                         [self.post.pk])
+        self.assertEqual(self.export(since='2999-01-01'), '')
+
+    def test_csv_is_importable(self):
+        """CSV читается обратно импортом."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.csv')
+            call_command('export_posts', format='csv', type='post',
+                         output=path)
+            with open(path, newline='') as dump:
+                rows = list(csv.DictReader(dump))
+            records = [record for record, _ in importer.read_records(
+                path, 'csv', 'post', 0
+            )]
+        self.assertEqual(rows[0]['text'], 'Пост, с запятой')
+        self.assertEqual(
+            [record['text'] for record in records],
+            ['Пост, с запятой', 'Чужой'],
+        )
+
+    def test_admin_action_streams(self):
+        """Действие в админке отдает выгрузку потоком."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass',
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'export_jsonl',
+            '_selected_action': [self.post.pk],
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        records = [
+            json.loads(line) for line in
+            b''.join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(len(records), 2)
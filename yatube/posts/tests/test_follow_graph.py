@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import follow_graph
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username='author%s' % number)
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def follow(self, author):
+        Follow.objects.create(user=self.reader, author=author)
+
+    def test_checks_after_load_skip_database(self):
+        """Граф грузится одним запросом, дальше ответы без базы."""
+        self.follow(self.authors[1])
+        with self.assertNumQueries(1):
+            follow_graph.following(self.reader.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(
+                self.reader.pk, self.authors[1].pk))
+            self.assertFalse(follow_graph.is_following(
+                self.reader.pk, self.authors[0].pk))
+            self.assertEqual(list(follow_graph.following(self.reader.pk)),
+                             [self.authors[1].pk])
+
+    def test_follow_and_unfollow_reset_graph(self):
+        """Подписка и отписка сбрасывают граф, он перечитывается."""
+        follow_graph.following(self.reader.pk)
+        for author in reversed(self.authors):
+            self.follow(author)
+        Follow.objects.get(user=self.reader, author=self.authors[1]).delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(follow_graph.following(self.reader.pk)),
+                [self.authors[0].pk, self.authors[2].pk],
+            )
+
+    def test_rolled_back_follow_leaves_no_trace(self):
+        """Откатившаяся подписка не остается в закешированном графе."""
+        follow_graph.following(self.reader.pk)
+        try:
+            with transaction.atomic():
+                self.follow(self.authors[0])
+                raise DatabaseError
+        except DatabaseError:
+            pass
+        self.assertFalse(follow_graph.is_following(
+            self.reader.pk, self.authors[0].pk))
+
+    @override_settings(FOLLOW_GRAPH_LIMIT=2)
+    def test_large_graph_is_not_stored(self):
+        """Сверх лимита список не хранится, проверки кешируются попарно."""
+        for author in self.authors:
+            self.follow(author)
+        self.assertIsNone(follow_graph.following(self.reader.pk))
+        self.assertTrue(follow_graph.is_following(
+            self.reader.pk, self.authors[0].pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(
+                self.reader.pk, self.authors[0].pk))
+        Follow.objects.get(user=self.reader, author=self.authors[0]).delete()
+        self.assertFalse(follow_graph.is_following(
+            self.reader.pk, self.authors[0].pk))
+
+    @override_settings(FOLLOW_GRAPH_LIMIT=2)
+    def test_graph_growing_past_limit_is_dropped(self):
+        """Подписка сверх лимита заменяет список меткой."""
+        self.follow(self.authors[0])
+        self.follow(self.authors[1])
+        follow_graph.following(self.reader.pk)
+        self.follow(self.authors[2])
+        self.assertIsNone(follow_graph.following(self.reader.pk))
+
+    def test_profile_reads_follow_state_from_graph(self):
+        """Профиль автора узнает о подписке из графа."""
+        client = Client()
+        client.force_login(self.reader)
+        client.get(reverse('posts:profile_follow',
+                           kwargs={'username': self.authors[0]}))
+        response = client.get(reverse(
+            'posts:profile', kwargs={'username': self.authors[0]}
+        ))
+        self.assertTrue(response.context['following'])
@@ -0,0 +1,166 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import follows
+from posts.models import AuthorStats, Follow
+
+User = get_user_model()
+READERS_NUMBER = 25
+
+
+class FollowListTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [
+            User.objects.create_user(username='reader%02d' % number)
+            for number in range(READERS_NUMBER)
+        ]
+        for reader in cls.readers:
+            Follow.objects.create(user=reader, author=cls.author)
+        # новые подписки сверху
+        cls.expected = [reader.username for reader in reversed(cls.readers)]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_followers_page_cursor(self):
+        """Подписчики листаются курсором, новые сверху."""
+        url = reverse('posts:followers', kwargs={'username': 'author'})
+        first = self.client.get(url).context['page_obj']
+        second = self.client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            [user.username for user in list(first) + list(second)],
+            self.expected,
+        )
+        self.assertFalse(second.has_next())
+
+    def test_following_page(self):
+        """Подписки пользователя видны на его странице подписок."""
+        response = self.client.get(
+            reverse('posts:following', kwargs={'username': 'reader00'})
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.author])
+
+    def test_api_followers_cursor(self):
+        """API подписчиков листается курсором."""
+        url = reverse('api_v1:followers', kwargs={'username': 'author'})
+        first = self.get_json(url, {'limit': 20})
+        second = self.get_json(url, {'limit': 20, 'cursor': first['next']})
+        results = first['results'] + second['results']
+        self.assertEqual(
+            [user['username'] for user in results], self.expected
+        )
+        self.assertIsNone(second['next'])
+        following = self.get_json(reverse(
+            'api_v1:following', kwargs={'username': 'reader00'}
+        ))
+        self.assertEqual(following['results'][0]['username'], 'author')
+
+    def get_json(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content))
+
+
+class FollowActionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username='author%s' % number)
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def followed(self):
+        return set(Follow.objects.filter(user=self.reader).values_list(
+            'author__username', flat=True
+        ))
+
+    def test_follow_answers_json_to_fetch(self):
+        """Подписка через fetch получает JSON, без JS - редирект к автору."""
+        url = reverse('posts:profile_follow', kwargs={'username': 'author0'})
+        response = self.authorized_client.get(
+            url, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(
+            response.json(), {'username': 'author0', 'following': True}
+        )
+        response = self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author0'}
+        ))
+        self.assertRedirects(response, reverse(
+            'posts:profile', kwargs={'username': 'author0'}
+        ))
+        self.assertEqual(self.followed(), set())
+
+    def test_bulk_follow_and_unfollow(self):
+        """Пачка подписок применяется целиком и сообщает, что изменилось."""
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        response = self.authorized_client.post(
+            reverse('api_v1:follows'),
+            json.dumps({
+                'follow': [
+                    'author0', 'author1', 'author1', 'reader', 'nobody',
+                ],
+                'unfollow': ['author2'],
+            }),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {
+            'followed': ['author0', 'author1'],
+            'unfollowed': ['author2'],
+            'missing': ['nobody'],
+        })
+        self.assertEqual(self.followed(), {'author0', 'author1'})
+        self.assertEqual(
+            User.objects.get(username='reader').stats.following_count, 2
+        )
+        self.assertEqual(
+            [author.stats.followers_count for author in User.objects.filter(
+                username__startswith='author'
+            ).select_related('stats').order_by('username')],
+            [1, 1, 0],
+        )
+
+    @override_settings(BACKGROUND_JOBS_ASYNC=True)
+    def test_bulk_cost_does_not_grow_with_size(self):
+        """Пачка стоит одинаково для одного и для многих авторов:
+        посты в ленту подтягивают фоновые задачи."""
+        def cost(follow, unfollow=()):
+            with CaptureQueriesContext(connection) as queries:
+                follows.apply(self.reader, follow, unfollow)
+            return len(queries)
+
+        AuthorStats.objects.create(user=self.reader)
+        one = cost(['author0'])
+        self.assertEqual(cost(['author1', 'author2']), one)
+        many = cost([], ['author0', 'author1', 'author2'])
+        cost(['author0'])
+        self.assertEqual(cost([], ['author0']), many)
+
+    def test_bulk_rejects_bad_requests(self):
+        """Анонимам и противоречивым пачкам - ошибка без изменений."""
+        url = reverse('api_v1:follows')
+        response = Client().post(url, {'follow': ['author0']})
+        self.assertEqual(response.status_code, 401)
+        response = self.authorized_client.post(
+            url, {'follow': ['author0'], 'unfollow': ['author0']}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.followed(), set())
@@ -0,0 +1,144 @@
+import io
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import groups
+from posts.models import Group, GroupStats, Post
+
+User = get_user_model()
+
+
+class GroupCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def group_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries
+            if 'posts_group' in query['sql']
+        ]
+
+    def test_create_page_reads_groups_from_cache(self):
+        """Открытая страница создания поста не запрашивает группы."""
+        url = reverse('posts:post_create')
+        self.assertTrue(self.group_queries(url))
+        self.assertEqual(self.group_queries(url), [])
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Тестовая группа')
+
+    def test_group_page_reads_group_from_cache(self):
+        """Страница группы находит группу по slug без запроса."""
+        groups.get_by_slug(self.group.slug)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                groups.get_by_slug(self.group.slug).pk, self.group.pk
+            )
+            self.assertEqual(
+                groups.get_many([self.group.pk])[self.group.pk].slug,
+                self.group.slug,
+            )
+
+    def test_group_save_resets_cache(self):
+        """Правка группы видна сразу, старый slug больше не находится."""
+        groups.get_by_slug(self.group.slug)
+        groups.all_groups()
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.slug = 'new-slug'
+        group.save()
+        self.assertIsNone(groups.get_by_slug('test-slug'))
+        self.assertEqual(groups.get_by_slug('new-slug').title,
+                         'Новое название')
+        self.assertEqual(
+            [group.title for group in groups.all_groups()],
+            ['Новое название'],
+        )
+        response = self.authorized_client.get(
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class GroupDirectoryTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Первая', slug='first')
+        cls.other = Group.objects.create(title='Вторая', slug='second')
+
+    def setUp(self):
+        cache.clear()
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def test_counters_follow_posts(self):
+        """Счетчик и время последнего поста меняются с постами."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, group=self.group,
+        )
+        self.assertEqual(self.stats(self.group).posts_count, 1)
+        self.assertEqual(self.stats(self.group).last_post_at, post.pub_date)
+        post.group = self.other
+        post.save()
+        self.assertEqual(self.stats(self.group).posts_count, 0)
+        self.assertEqual(self.stats(self.other).posts_count, 1)
+        post.delete()
+        self.assertEqual(self.stats(self.other).posts_count, 0)
+        self.assertIsNone(self.stats(self.other).last_post_at)
+
+    def test_last_post_time_falls_back_on_delete(self):
+        """Удаление последнего поста возвращает время предыдущего."""
+        first = Post.objects.create(
+            text='Первый', author=self.user, group=self.group,
+        )
+        earlier = first.pub_date - timedelta(hours=1)
+        Post.objects.filter(pk=first.pk).update(pub_date=earlier)
+        second = Post.objects.create(
+            text='Второй', author=self.user, group=self.group,
+        )
+        self.assertEqual(self.stats(self.group).last_post_at, second.pub_date)
+        second.delete()
+        self.assertEqual(self.stats(self.group).last_post_at, earlier)
+
+    def test_directory_lists_groups_with_counts(self):
+        """Каталог показывает группы, число постов и обновляется."""
+        url = reverse('posts:group_directory')
+        response = self.client.get(url)
+        self.assertContains(response, 'Первая')
+        self.assertContains(response, 'Постов: 0')
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        response = self.client.get(url)
+        self.assertContains(response, 'Постов: 1')
+        self.assertEqual(
+            list(response.context['groups']), [self.group, self.other]
+        )
+
+    def test_recount_fixes_group_stats(self):
+        """recount исправляет разошедшиеся счетчики групп."""
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        GroupStats.objects.filter(group=self.group).update(posts_count=7)
+        call_command('recount', stdout=io.StringIO())
+        self.assertEqual(self.stats(self.group).posts_count, 1)
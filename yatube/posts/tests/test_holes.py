@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import holes
+from posts.forms import CommentForm
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class SharedPageTest(TestCase):
+    """Публичные страницы кешируются одна на всех, а фрагменты
+    пользователя подставляются при каждом ответе."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_index_body_shared_by_all_users(self):
+        """Главная рендерится один раз, шапка у каждого своя."""
+        url = reverse('posts:index')
+        self.assertContains(self.client.get(url), 'Войти')
+        for client, username in ((self.author_client, 'author'),
+                                 (self.reader_client, 'reader')):
+            response = client.get(url)
+            self.assertTemplateNotUsed(response, 'posts/index.html')
+            self.assertContains(response, 'Пользователь: %s' % username)
+            self.assertContains(response, 'Избранные авторы')
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Пользователь:')
+        self.assertNotContains(response, 'Избранные авторы')
+
+    def test_post_detail_holes(self):
+        """Правка - только автору, форма с CSRF - только вошедшим."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertIsInstance(response.context['form'], CommentForm)
+        response = self.author_client.get(url)
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertIsInstance(response.context['form'], CommentForm)
+        self.assertContains(response, edit_url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = self.reader_client.get(url)
+        self.assertNotContains(response, edit_url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_follow_button_per_user(self):
+        """Кнопка подписки на общей странице автора - своя у каждого."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        self.assertContains(self.reader_client.get(url), 'Отписаться')
+        response = self.author_client.get(url)
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Подписаться')
+
+    def test_marker_in_post_text_is_not_filled(self):
+        """Метка в тексте поста экранируется и не заполняется."""
+        with holes.shared():
+            marker = holes.punch(None, 'header')
+        Post.objects.create(text=marker, author=self.author)
+        response = self.reader_client.get(reverse('posts:index'))
+        self.assertEqual(
+            response.content.decode().count('Пользователь: reader'), 1
+        )
@@ -0,0 +1,158 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+
+from posts import importer
+from posts.models import Comment, Follow, Post, TimelineEntry
+from posts.search import SearchPaginator
+
+User = get_user_model()
+RECORDS = [
+    {'type': 'post', 'id': 101, 'author': 'leo', 'group': 'classics',
+     'text': 'Все счастливые семьи похожи друг на друга',
+     'pub_date': '1877-01-01T10:00:00'},
+    {'type': 'post', 'id': 102, 'author': 'leo', 'text': 'Второй пост',
+     'pub_date': '1877-01-02T10:00:00'},
+    {'type': 'comment', 'post': 101, 'author': 'fedor', 'text': 'Согласен'},
+    {'type': 'comment', 'post': 999, 'author': 'fedor', 'text': 'Нет поста'},
+    {'type': 'follow', 'user': 'fedor', 'author': 'leo'},
+    {'type': 'follow', 'user': 'leo', 'author': 'leo'},
+    {'type': 'post', 'author': 'leo'},
+]
+
+
+class ImportTest(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'dump.jsonl')
+        with open(self.path, 'w') as dump:
+            for record in RECORDS:
+                dump.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def import_dump(self, **options):
+        call_command('import_yatube', self.path, batch_size=2,
+                     stdout=io.StringIO(), **options)
+
+    def test_import_rebuilds_denormalized_state(self):
+        """Импорт сохраняет даты и перестраивает счетчики, ленты и поиск."""
+        self.import_dump()
+        post = Post.objects.get(pk=101)
+        self.assertEqual(post.pub_date.year, 1877)
+        self.assertEqual(post.group.slug, 'classics')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        leo = User.objects.get(username='leo')
+        self.assertFalse(leo.has_usable_password())
+        self.assertEqual(leo.stats.posts_count, 2)
+        self.assertEqual(leo.stats.followers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='fedor').count(), 2
+        )
+        self.assertEqual(
+            list(SearchPaginator('счастливые', 10).page()), [post]
+        )
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+    def test_dates_kept_without_touching_fields(self):
+        """Даты из файла сохраняются, а обычное создание поста во время
+        импорта по-прежнему получает текущее время."""
+        leo = User.objects.create(username='leo')
+        created = []
+        insert = importer.insert_as_is
+
+        def insert_and_create(model, objs):
+            insert(model, objs)
+            created.append(Post.objects.create(text='Живой', author=leo))
+
+        with mock.patch('posts.importer.insert_as_is', insert_and_create):
+            self.import_dump()
+        self.assertEqual(Post.objects.get(pk=102).pub_date.year, 1877)
+        self.assertTrue(created)
+        for post in created:
+            post.refresh_from_db()
+            self.assertGreater(post.pub_date.year, 1877)
+
+    def assertTriggersAndIndexes(self):
+        with connection.cursor() as cursor:
+            for model in importer.DEFERRED_INDEX_MODELS:
+                constraints = connection.introspection.get_constraints(
+                    cursor, model._meta.db_table
+                )
+                for index in model._meta.indexes:
+                    self.assertIn(index.name, constraints)
+        author, _ = User.objects.get_or_create(username='leo')
+        post = Post.objects.create(text='Новый роман', author=author)
+        self.assertIn(post, list(SearchPaginator('роман', 10).page()))
+
+    def test_triggers_and_indexes_restored(self):
+        """После импорта триггеры поиска и индексы лент на месте."""
+        self.import_dump()
+        self.assertTriggersAndIndexes()
+
+    def test_bad_lines_are_skipped(self):
+        """Битые строки и не объекты пропускаются, импорт доходит
+        до конца."""
+        with open(self.path, 'a') as dump:
+            dump.write('{"type": "post", "author": \n')
+            dump.write('[1, 2]\n')
+            dump.write('"строка"\n')
+        counts = importer.Importer(self.path, 'jsonl', batch_size=2).run()
+        # три битые строки и три неверные записи из RECORDS
+        self.assertEqual(counts['skipped'], 6)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+        self.assertTriggersAndIndexes()
+
+    def test_resume_after_crash(self):
+        """Прерванный импорт продолжается с контрольной точки без дублей."""
+        save_batch = importer.Importer.save_batch
+        calls = []
+
+        def crash_on_second(self, *args):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError('сбой')
+            return save_batch(self, *args)
+
+        with mock.patch.object(importer.Importer, 'save_batch',
+                               crash_on_second):
+            with self.assertRaises(RuntimeError):
+                self.import_dump()
+        self.assertTrue(os.path.exists(self.path + '.checkpoint'))
+        # до повторного запуска сайт работает с индексами и поиском
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table
+            )
+        for index in Post._meta.indexes:
+            self.assertIn(index.name, constraints)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 0)
+        self.import_dump()
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_csv(self):
+        """CSV читается с заголовком и видом записей из --type."""
+        path = os.path.join(self.directory, 'posts.csv')
+        with open(path, 'w', newline='') as dump:
+            dump.write('id,author,text\n')
+            dump.write('7,leo,"Строка, с запятой\nи переносом"\n')
+        call_command('import_yatube', path, type='post',
+                     stdout=io.StringIO())
+        self.assertEqual(
+            Post.objects.get(pk=7).text, 'Строка, с запятой\nи переносом'
+        )
@@ -0,0 +1,206 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling, stats
+from core.metrics import CACHE_RATIO, REQUESTS, Registry, _labels, registry
+from posts.models import Post
+
+User = get_user_model()
+TOKEN = 'secret-token'
+
+
+def record_in_child(directory):
+    child = Registry(directory)
+    child.record('posts:index', 'GET', 200, 0.02, {'sql': 4})
+    child.flush(force=True)
+
+
+@override_settings(METRICS_TOKEN=TOKEN)
+class MetricsEndpointTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.admin = User.objects.create_user(username='admin', is_staff=True)
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def scrape(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer %s' % TOKEN
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_metrics_are_protected(self):
+        """Метрики доступны персоналу и по токену, остальным - 403."""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(
+            self.authorized_client.get(reverse('metrics')).status_code, 403
+        )
+        self.assertEqual(self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong'
+        ).status_code, 403)
+        admin_client = Client()
+        admin_client.force_login(self.admin)
+        self.assertEqual(
+            admin_client.get(reverse('metrics')).status_code, 200
+        )
+        self.scrape()
+
+    def test_requests_are_counted_per_view(self):
+        """Запросы учитываются по имени URL с гистограммами."""
+        self.client.get(reverse('posts:index'))
+        self.authorized_client.get(reverse('posts:follow_index'))
+        text = self.scrape()
+        self.assertIn(
+            'yatube_requests_total{method="GET",status="200",'
+            'view="posts:index"}', text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:follow_index",le="+Inf"}', text
+        )
+        self.assertIn(
+            'yatube_request_queries_count{view="posts:follow_index"}', text
+        )
+        self.assertIn('# TYPE yatube_request_queries histogram', text)
+
+    def queries(self, view):
+        _, histograms = registry.collect()
+        return histograms.get(
+            ('yatube_request_queries', _labels(view=view)), [0]
+        )[-1]
+
+    def test_streamed_queries_are_counted(self):
+        """Запросы, сделанные при чтении потокового тела, учитываются."""
+        before = self.queries('api_v1:feed')
+        response = self.client.get(reverse('api_v1:feed'))
+        b''.join(response.streaming_content)
+        self.assertGreater(self.queries('api_v1:feed'), before)
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_request_is_not_timed(self):
+        """Вне выборки профилировщика SQL не оборачивается замером."""
+        wrappers = []
+        original = profiling._sql_timer
+
+        def spy(*args):
+            wrappers.append(args[1])
+            return original(*args)
+
+        profiling._sql_timer = spy
+        self.addCleanup(setattr, profiling, '_sql_timer', original)
+        cache.clear()
+        before = self.queries('posts:index')
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(wrappers, [])
+        self.assertGreater(self.queries('posts:index'), before)
+        self.assertIn(stats._count_sql, connection.execute_wrappers)
+
+
+class RegistryTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Корзины гистограммы накопительные, count - число наблюдений."""
+        registry = Registry('')
+        for queries in (1, 4, 100):
+            registry.record('posts:index', 'GET', 200, 0.01,
+                            {'sql': queries})
+        text = registry.render()
+        self.assertIn(
+            'yatube_request_queries_bucket{view="posts:index",le="1.0"} 1',
+            text
+        )
+        self.assertIn(
+            'yatube_request_queries_bucket{view="posts:index",le="5.0"} 2',
+            text
+        )
+        self.assertIn(
+            'yatube_request_queries_bucket{view="posts:index",le="+Inf"} 3',
+            text
+        )
+        self.assertIn('yatube_request_queries_sum{view="posts:index"} 105',
+                      text)
+
+    def test_cache_hit_ratio(self):
+        """Доля попаданий считается по сумме попаданий и промахов."""
+        registry = Registry('')
+        registry.record('posts:index', 'GET', 200, 0.01,
+                        {'cache_hit': 3, 'cache_miss': 1})
+        self.assertIn('%s{view="posts:index"} 0.75' % CACHE_RATIO,
+                      registry.render())
+
+    def test_processes_are_aggregated(self):
+        """Значения процессов из общего каталога суммируются."""
+        parent = Registry(self.directory)
+        parent.record('posts:index', 'GET', 200, 0.01, {'sql': 2})
+        process = multiprocessing.get_context('fork').Process(
+            target=record_in_child, args=(self.directory,)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+        counters, histograms = parent.collect()
+        key = REQUESTS, _labels(view='posts:index', method='GET', status=200)
+        self.assertEqual(counters[key], 2)
+        queries = histograms['yatube_request_queries',
+                             _labels(view='posts:index')]
+        self.assertEqual(queries[-1], 6)
+
+    def test_forked_process_starts_empty(self):
+        """Дочерний процесс не наследует значения родителя."""
+        registry = Registry(self.directory)
+        registry.record('posts:index', 'GET', 200, 0.01, {})
+        registry.pid = -1
+        self.assertEqual(registry.snapshot()['counters'], [])
+
+    def test_unknown_methods_share_label(self):
+        """Произвольные методы не заводят новых серий."""
+        registry = Registry('')
+        for method in ('GET', 'BREW', 'X' * 100):
+            registry.record('posts:index', method, 405, 0.01, {})
+        counters, _ = registry.collect()
+        self.assertEqual(
+            sorted(dict(labels)['method'] for name, labels in counters
+                   if name == REQUESTS),
+            ['GET', 'other'],
+        )
+
+    @override_settings(METRICS_FLUSH_INTERVAL=0)
+    def test_concurrent_flushes_keep_file_valid(self):
+        """Потоки, сбрасывающие метрики разом, не портят файл."""
+        registry = Registry(self.directory)
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            for _ in range(50):
+                registry.record('posts:index', 'GET', 200, 0.01, {})
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(os.listdir(self.directory), [registry.name])
+        counters, _ = registry.collect()
+        key = REQUESTS, _labels(view='posts:index', method='GET', status=200)
+        self.assertEqual(counters[key], 400)
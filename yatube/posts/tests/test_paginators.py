@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from posts.paginators import CursorPage, CursorPaginator
+
+User = get_user_model()
+ALL_POST_NUMBER = 25
+PER_PAGE = 10
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(text='text %s' % i, author=cls.user)
+            for i in range(ALL_POST_NUMBER)
+        )
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def test_walk_forward_and_back(self):
+        """Курсоры проходят ленту целиком в обе стороны без пропусков."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        walked = [post for page in pages for post in page]
+        self.assertEqual(walked, self.expected)
+        self.assertFalse(pages[0].has_previous())
+        back = paginator.page(pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[-2]))
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Битый курсор ведет на первую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        page = paginator.get_page('not-a-cursor')
+        self.assertEqual(list(page), self.expected[:PER_PAGE])
+
+    def test_cursor_page_does_not_count(self):
+        """Страница по курсору - это один запрос без COUNT."""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        cursor = paginator.page().next_cursor
+        with self.assertNumQueries(1):
+            len(paginator.page(cursor))
+
+
+class PagModeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(text='text %s' % i, author=cls.user)
+            for i in range(ALL_POST_NUMBER)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_small_feed_is_numbered(self):
+        """Небольшая лента листается по номерам страниц."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertIsInstance(response.context['page_obj'], Page)
+
+    def test_large_feed_switches_to_cursor(self):
+        """Большая лента и запросы с cursor листаются по курсору."""
+        with mock.patch('posts.views.NUMBERED_PAGINATION_LIMIT', PER_PAGE):
+            response = self.client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj, CursorPage)
+        self.assertContains(response, page_obj.next_cursor)
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': page_obj.next_cursor}
+        )
+        self.assertIsInstance(response.context['page_obj'], CursorPage)
+        self.assertEqual(len(response.context['page_obj']), PER_PAGE)
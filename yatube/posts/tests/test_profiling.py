@@ -0,0 +1,65 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.profiling import HEADER, server_timing
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(REQUEST_PROFILING_HEADER=True,
+                   REQUEST_PROFILING_SAMPLE_RATE=1)
+class ProfilingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def timing(self, response):
+        return dict(
+            entry.split(';', 1) if ';' in entry else (entry, '')
+            for entry in response[HEADER].split(', ')
+        )
+
+    def test_header_reports_sql_render_and_cache(self):
+        """Server-Timing содержит SQL, рендер, кеш и общее время."""
+        response = self.client.get(reverse('posts:index'))
+        timing = self.timing(response)
+        for name in ('sql', 'render', 'cache_miss', 'total'):
+            self.assertIn(name, timing)
+        self.assertIn('dur=', timing['sql'])
+        self.assertIn('dur=', timing['render'])
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('cache_hit', self.timing(response))
+
+    def test_log_line_is_json(self):
+        """Замеры пишутся одной JSON-строкой в логгер core.profiling."""
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], reverse('posts:index'))
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql'], 0)
+        self.assertIn('total_ms', record)
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_request_is_not_profiled(self):
+        """Запрос вне выборки не получает заголовок."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header(HEADER))
+
+    def test_server_timing_format(self):
+        """Длительности идут в dur, счетчики - в desc."""
+        self.assertEqual(
+            server_timing({'sql': 3, 'sql_ms': 1.234, 'total_ms': 5}),
+            'sql;dur=1.2;desc="3", total;dur=5.0',
+        )
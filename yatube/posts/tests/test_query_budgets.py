@@ -0,0 +1,35 @@
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+
+from core.benchmark import QueryCounter
+from posts import benchmarks
+
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+SCALE = 0.0005
+
+
+@override_settings(CACHES=NO_CACHE)
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        benchmarks.seed(SCALE)
+        cls.dataset = benchmarks.Dataset()
+
+    def test_routes_fit_query_budget(self):
+        """Каждый маршрут posts укладывается в свой бюджет запросов."""
+        guest = Client()
+        reader = Client()
+        reader.force_login(self.dataset.reader)
+        for route in benchmarks.ROUTES:
+            with self.subTest(route=route.name):
+                if route.setup:
+                    route.setup(self.dataset)
+                client = reader if route.auth else guest
+                queries = QueryCounter()
+                with connection.execute_wrapper(queries):
+                    response = route.send(client, self.dataset)
+                self.assertLess(response.status_code, 400)
+                self.assertLessEqual(queries.count, route.budget)
@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.benchmark import QueryRecorder, plan_problems, query_plan
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+ALL_POST_NUMBER = 15
+
+
+class QueryPlanTest(TestCase):
+    """Запросы лент идут по индексам: без полного просмотра таблиц
+    и без сортировки во временном B-дереве."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание',
+        )
+        Post.objects.bulk_create(
+            Post(text='Пост %s' % i, author=cls.author, group=cls.group)
+            for i in range(ALL_POST_NUMBER)
+        )
+        cls.post = Post.objects.first()
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Ок')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.author}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:followers', kwargs={'username': cls.author}),
+            reverse('posts:following', kwargs={'username': cls.reader}),
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def assertIndexedPlans(self, url, params=None):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        for sql, sql_params in recorder.queries:
+            if not sql.startswith('SELECT') or '"posts_' not in sql:
+                continue
+            plan = query_plan(connection, sql, sql_params)
+            self.assertEqual(
+                plan_problems(plan), [], '%s\n%s\n%s' % (url, sql, plan)
+            )
+        return response
+
+    def test_numbered_pages(self):
+        """Нумерованные страницы лент."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertIndexedPlans(url)
+
+    def test_cursor_pages(self):
+        """Страницы лент по курсору."""
+        with mock.patch('posts.views.NUMBERED_PAGINATION_LIMIT', 0):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    page_obj = self.assertIndexedPlans(url).context.get(
+                        'page_obj'
+                    )
+                    if page_obj is not None and page_obj.has_next():
+                        self.assertIndexedPlans(
+                            url, {'cursor': page_obj.next_cursor}
+                        )
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=0)
+    def test_celebrity_feed(self):
+        """Лента с постами знаменитостей: диапазоны индексов ленты
+        и постов автора, а не OR по всем постам."""
+        url = reverse('posts:follow_index')
+        page_obj = self.assertIndexedPlans(url).context['page_obj']
+        self.assertTrue(page_obj.has_next())
+        self.assertIndexedPlans(url, {'cursor': page_obj.next_cursor})
@@ -0,0 +1,99 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+PER_PAGE = 10
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            text='Пишу про котов и собак', author=cls.user,
+        )
+        cls.other = Post.objects.create(
+            text='Совсем другая тема', author=cls.user,
+        )
+        Comment.objects.create(
+            post=cls.other, author=cls.user, text='А у меня живут коты',
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, query, cursor=None):
+        params = {'q': query}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get(reverse('posts:search'), params)
+        return response.context['page_obj']
+
+    def test_finds_posts_by_text_and_comments(self):
+        """Поиск находит пост по его тексту и по комментариям."""
+        self.assertEqual(list(self.found('котов')), [self.post])
+        self.assertEqual(list(self.found('коты')), [self.other])
+        self.assertEqual(list(self.found('кот')), [self.post, self.other])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Триггеры обновляют индекс при правке и удалении."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Теперь про попугаев'
+        post.save()
+        self.assertEqual(list(self.found('котов')), [])
+        self.assertEqual(list(self.found('попугаев')), [post])
+        Post.objects.filter(pk=self.other.pk).delete()
+        self.assertEqual(list(self.found('коты')), [])
+
+    def test_fts_syntax_is_escaped(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        for query in ('"', 'NOT', 'кот*) OR (', '***'):
+            self.assertEqual(
+                self.client.get(
+                    reverse('posts:search'), {'q': query}
+                ).status_code, 200,
+            )
+
+    def test_cursor_pagination(self):
+        """Выдача листается курсором без пропусков и повторов."""
+        Post.objects.bulk_create(
+            Post(text='Слон номер %s' % i, author=self.user)
+            for i in range(PER_PAGE + 5)
+        )
+        first = self.found('слон')
+        second = self.found('слон', first.next_cursor)
+        self.assertEqual(len(first), PER_PAGE)
+        self.assertEqual(len(second), 5)
+        self.assertFalse(second.has_next())
+        walked = {post.pk for post in list(first) + list(second)}
+        self.assertEqual(len(walked), PER_PAGE + 5)
+        back = self.found('слон', second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+
+    def test_reindex(self):
+        """Команда перестраивает индекс с нуля."""
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_search')
+        self.assertEqual(list(self.found('кот')), [])
+        call_command('reindex_search', chunk_size=1, stdout=io.StringIO())
+        self.assertEqual(list(self.found('кот')), [self.post, self.other])
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идет через полнотекстовый индекс."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass',
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котов'}
+        )
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.post])
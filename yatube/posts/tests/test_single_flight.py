@@ -0,0 +1,114 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from core import single_flight
+from core.cache import cache_versioned
+
+THREADS = 20
+KEY = 'flight-test'
+
+
+class Counted:
+    """Медленный пересчет, считающий свои вызовы из всех потоков."""
+
+    def __init__(self, seconds=0.2):
+        self.seconds = seconds
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.seconds)
+        return 'value'
+
+
+def run_threads(target):
+    results = []
+    barrier = threading.Barrier(THREADS)
+
+    def worker():
+        barrier.wait()
+        results.append(target())
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class SingleFlightTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        """Одновременные промахи пересчитывает один поток."""
+        compute = Counted()
+        results = run_threads(
+            lambda: single_flight.get_or_set(KEY, compute, 60)
+        )
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(results, ['value'] * THREADS)
+
+    def test_stale_copy_while_refreshing(self):
+        """Пока один поток обновляет значение, другим - старая копия."""
+        cache.set(KEY, ('old', time.time() - 1, 0.1), 60)
+        token = single_flight._acquire(KEY)
+        compute = Counted(0)
+        self.assertEqual(single_flight.get_or_set(KEY, compute, 60), 'old')
+        self.assertEqual(compute.calls, 0)
+        single_flight._release(KEY, token)
+        self.assertEqual(single_flight.get_or_set(KEY, compute, 60), 'value')
+        self.assertEqual(compute.calls, 1)
+
+    def test_early_refresh_is_probabilistic(self):
+        """Свежее значение обновляется заранее лишь с вероятностью."""
+        cache.set(KEY, ('old', time.time() + 5, 1.0), 60)
+        compute = Counted(0)
+        with mock.patch('core.single_flight.random.random', return_value=0):
+            self.assertEqual(single_flight.get_or_set(KEY, compute, 60), 'old')
+        with mock.patch('core.single_flight.random.random',
+                        return_value=1 - 1e-6):
+            self.assertEqual(
+                single_flight.get_or_set(KEY, compute, 60), 'value'
+            )
+        self.assertEqual(compute.calls, 1)
+
+    def test_uncacheable_result_releases_waiters(self):
+        """None не кешируется, и ждущие не висят до таймаута."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+
+        start = time.monotonic()
+        run_threads(lambda: single_flight.get_or_set(KEY, compute, 60))
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertIsNone(cache.get(KEY))
+
+    def test_page_rendered_once_under_load(self):
+        """Страница под cache_versioned рендерится один раз на поток
+        одновременных промахов."""
+        render = Counted()
+
+        @cache_versioned('flight-page')
+        def page(request):
+            return HttpResponse(render())
+
+        def get():
+            request = RequestFactory().get('/flight/')
+            request.user = AnonymousUser()
+            return page(request).content
+
+        results = run_threads(get)
+        self.assertEqual(render.calls, 1)
+        self.assertEqual(results, [b'value'] * THREADS)
@@ -0,0 +1,68 @@
+import io
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+ALIAS = 'sqlite_tuning'
+
+
+class SQLiteTuningTest(SimpleTestCase):
+    """Настройка проверяется на отдельном файле: тестовая база в памяти
+    не переходит в WAL."""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        connections.databases[ALIAS] = dict(
+            connections.databases['default'], NAME=self.path, TEST={},
+        )
+        self.addCleanup(self.disconnect)
+
+    def disconnect(self):
+        connections[ALIAS].close()
+        del connections[ALIAS]
+        del connections.databases[ALIAS]
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def pragma(self, name):
+        with connections[ALIAS].cursor() as cursor:
+            cursor.execute('PRAGMA %s' % name)
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Новое соединение получает WAL, NORMAL и настроенные размеры."""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        # 1 - NORMAL
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(
+            self.pragma('busy_timeout'), settings.SQLITE_BUSY_TIMEOUT
+        )
+        self.assertEqual(self.pragma('cache_size'), settings.SQLITE_CACHE_SIZE)
+
+    def test_atomic_begins_immediate(self):
+        """atomic сразу берет блокировку записи."""
+        connection = connections[ALIAS]
+        connection.ensure_connection()
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic(using=ALIAS):
+                pass
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class BenchSQLiteTest(SimpleTestCase):
+    def test_benchmark_reports_both_modes(self):
+        """Стресс-тест сравнивает режимы без настройки и с ней."""
+        output = io.StringIO()
+        call_command('bench_sqlite', writers=2, readers=1, seconds=0.2,
+                     stdout=output)
+        text = output.getvalue()
+        self.assertIn('core.sqlite выключен', text)
+        self.assertIn('core.sqlite включен', text)
+        self.assertEqual(text.count('locked'), 4)
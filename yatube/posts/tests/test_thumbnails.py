@@ -0,0 +1,141 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from sorl.thumbnail import default
+
+from core.cache import bump
+from core.profiling import HEADER
+from posts import thumbnails
+from posts.models import Post, ThumbnailTask
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailWorkerTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.authorized_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF,
+                content_type='image/gif',
+            ),
+        })
+        self.post = Post.objects.get(text='Пост с картинкой')
+
+    def test_upload_enqueues_task(self):
+        """Загрузка картинки ставит нарезку в очередь, а не режет сразу."""
+        self.assertTrue(
+            ThumbnailTask.objects.filter(post=self.post).exists()
+        )
+        self.assertIsNone(thumbnails.ready(self.post, '960x339'))
+
+    def test_placeholder_until_ready(self):
+        """Пока миниатюры нет, лента показывает заглушку."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'thumbnail-placeholder.svg')
+
+    def test_worker_generates_thumbnail(self):
+        """Воркер нарезает миниатюру и снимает задачу."""
+        call_command('thumbnail_worker', processes=0, once=True,
+                     stdout=io.StringIO())
+        self.assertFalse(ThumbnailTask.objects.exists())
+        thumbnail = thumbnails.ready(self.post, '960x339')
+        self.assertIsNotNone(thumbnail)
+        self.assertTrue(thumbnail.exists())
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, 'thumbnail-placeholder.svg')
+
+    def test_worker_sweeps_posts_without_task(self):
+        """Картинку без задачи находит воркер, а не рендер страницы."""
+        post = Post.objects.create(
+            text='Импортированный пост', author=self.user,
+            image=SimpleUploadedFile(
+                name='imported.gif', content=SMALL_GIF,
+                content_type='image/gif',
+            ),
+        )
+        self.authorized_client.get(reverse('posts:index'))
+        self.assertFalse(ThumbnailTask.objects.filter(post=post).exists())
+        call_command('thumbnail_worker', processes=0, once=True,
+                     stdout=io.StringIO())
+        self.assertFalse(ThumbnailTask.objects.exists())
+        self.assertIsNotNone(thumbnails.ready(post, '960x339'))
+
+    def test_lookup_matches_sorl_kvstore(self):
+        """Пакетное чтение совпадает с хранилищем sorl: до нарезки,
+        из БД и из кеша."""
+        source = thumbnails.thumbnail_file(self.post.image.name, '960x339')
+        key = thumbnails.thumbnail_key(self.post, '960x339')
+
+        def compare():
+            found = thumbnails._lookup_many([key]).get(key)
+            expected = default.kvstore.get(source)
+            self.assertEqual(
+                found and found.serialize(),
+                expected and expected.serialize(),
+            )
+            return found
+
+        self.assertIsNone(compare())
+        call_command('thumbnail_worker', processes=0, once=True,
+                     stdout=io.StringIO())
+        cache.clear()
+        self.assertIsNotNone(compare())
+        self.assertIsNotNone(compare())
+
+    @override_settings(REQUEST_PROFILING_HEADER=True,
+                       REQUEST_PROFILING_SAMPLE_RATE=1)
+    def test_page_resolves_thumbnails_in_one_lookup(self):
+        """Миниатюры страницы читаются одним походом в хранилище."""
+        for number in range(3):
+            post = Post.objects.create(
+                text='Еще пост %s' % number, author=self.user,
+                image=SimpleUploadedFile(
+                    name='small%s.gif' % number, content=SMALL_GIF,
+                    content_type='image/gif',
+                ),
+            )
+            thumbnails.enqueue(post)
+        call_command('thumbnail_worker', processes=0, once=True,
+                     stdout=io.StringIO())
+        cache.clear()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIn('thumbnail_lookups;desc="2"', response[HEADER])
+        self.assertIn('thumbnail_lookups_saved;desc="6"', response[HEADER])
+        bump('posts')
+        response = self.authorized_client.get(reverse('posts:index'))
+        # карточки с готовыми миниатюрами уже в кеше
+        self.assertNotIn('thumbnail_lookups', response[HEADER])
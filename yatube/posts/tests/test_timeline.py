@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='follower')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            text='Старый пост',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.follower)
+
+    def follow(self):
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.author})
+        )
+
+    def feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        """После подписки старые посты автора попадают в ленту."""
+        self.follow()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=self.old_post).exists())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_new_post_fans_out(self):
+        """Новый пост раскладывается по лентам подписчиков."""
+        self.follow()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_repeated_follow_is_ignored(self):
+        """Повторная подписка не создает дубль и не меняет счетчики."""
+        self.follow()
+        self.follow()
+        self.assertEqual(Follow.objects.filter(
+            user=self.follower, author=self.author).count(), 1)
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).stats.followers_count, 1
+        )
+
+    def test_unfollow_prunes_timeline(self):
+        """После отписки посты автора убираются из ленты."""
+        self.follow()
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': self.author})
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists()
+        )
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=0)
+    def test_celebrity_posts_are_pulled(self):
+        """Посты знаменитостей не раскладываются, а читаются напрямую."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=1)
+    def test_celebrity_posts_merge_with_timeline(self):
+        """Посты знаменитости сливаются с лентой под одним курсором."""
+        fan = User.objects.create_user(username='fan')
+        other = User.objects.create_user(username='other')
+        # у author два подписчика - знаменитость, у other - один
+        Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=other)
+        posts = [
+            Post.objects.create(
+                text='Пост %s' % number,
+                author=(self.author, other)[number % 2],
+            )
+            for number in range(12)
+        ]
+        url = reverse('posts:follow_index')
+        first = self.authorized_client.get(url).context['page_obj']
+        second = self.authorized_client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            list(first) + list(second), [*reversed(posts), self.old_post]
+        )
+        self.assertFalse(second.has_next())
+
+    def test_former_celebrity_posts_are_caught_up(self):
+        """Посты, написанные, пока автор был знаменитостью, попадают
+        в ленты после перехода порога вниз."""
+        reader = User.objects.create_user(username='reader')
+        with self.settings(TIMELINE_CELEBRITY_FOLLOWERS=1):
+            Follow.objects.create(user=self.follower, author=self.author)
+            Follow.objects.create(user=reader, author=self.author)
+            post = Post.objects.create(text='Пост звезды', author=self.author)
+            self.assertFalse(
+                TimelineEntry.objects.filter(post=post).exists()
+            )
+            Follow.objects.filter(user=reader).delete()
+        self.assertEqual(self.feed(), [post, self.old_post])
@@ -0,0 +1,131 @@
+from django.core.cache import cache
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from core import stats
+
+from .models import Post, ThumbnailTask
+
+# Все размеры, которые выводят шаблоны, с опциями sorl-thumbnail.
+SIZES = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+
+
+def thumbnail_file(image, geometry):
+    """ImageFile миниатюры с тем же именем, что выдаст get_thumbnail.
+
+    Повторяет подготовку опций ThumbnailBackend, но не открывает
+    исходный файл.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(SIZES[geometry])
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def thumbnail_key(post, geometry):
+    """Ключ миниатюры в key-value хранилище sorl."""
+    return add_prefix(thumbnail_file(post.image.name, geometry).key)
+
+
+def _lookup_many(keys):
+    """Записи key-value хранилища sorl за два похода: кеш, затем БД.
+
+    Повторяет чтение cached_db_kvstore пачкой: ключи кеша и таблица
+    KVStore - его внутренности, совпадение с default.kvstore.get
+    закреплено тестом. Промах в кеш не записывается, иначе готовую
+    позже миниатюру страница бы так и не увидела.
+    """
+    if not keys:
+        return {}
+    found = {
+        key: value for key, value in cache.get_many(keys).items()
+        if value != EMPTY_VALUE
+    }
+    missing = [key for key in keys if key not in found]
+    # по тегу на пост это был бы get к кешу и запрос к БД на промах
+    stats.incr('thumbnail_lookups', 1 + bool(missing))
+    stats.incr('thumbnail_lookups_saved',
+               len(keys) + len(missing) - 1 - bool(missing))
+    if missing:
+        stored = dict(KVStore.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        if stored:
+            cache.set_many(stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(stored)
+    return {key: deserialize_image_file(found[key]) for key in found}
+
+
+def resolve_many(posts, geometry):
+    """Готовые миниатюры постов страницы: {post.pk: ImageFile или None}.
+
+    Вместо запроса к хранилищу на каждый тег - один get_many к кешу
+    и не больше одного запроса к БД на всю страницу.
+    """
+    keys = {
+        post.pk: thumbnail_key(post, geometry)
+        for post in posts if post.image
+    }
+    found = _lookup_many(list(set(keys.values())))
+    return {pk: found.get(key) for pk, key in keys.items()}
+
+
+def ready(post, geometry):
+    """Готовая миниатюра поста или None, если ее еще не нарезали."""
+    if not post.image:
+        return None
+    return resolve_many([post], geometry)[post.pk]
+
+
+def enqueue(post):
+    """Ставит нарезку всех размеров для картинки поста в очередь."""
+    ThumbnailTask.objects.update_or_create(
+        post_id=post.pk, defaults={'attempts': 0}
+    )
+
+
+def sweep(batch_size):
+    """Ставит в очередь посты с картинкой, у которых нет ни миниатюр,
+    ни задачи: загруженные до очереди, импортированные или с потерянной
+    задачей. Возвращает число поставленных.
+    """
+    posts = Post.objects.exclude(image='').filter(
+        thumbnail_task__isnull=True
+    ).only('id', 'image').order_by('id')
+    queued, last = 0, 0
+    while True:
+        batch = list(posts.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            return queued
+        last = batch[-1].pk
+        missing = set()
+        for geometry in SIZES:
+            resolved = resolve_many(batch, geometry)
+            missing.update(pk for pk, image in resolved.items() if not image)
+        ThumbnailTask.objects.bulk_create(
+            [ThumbnailTask(post_id=pk) for pk in missing],
+            ignore_conflicts=True,
+        )
+        queued += len(missing)
+
+
+def generate(image):
+    """Нарезает все размеры; вызывается в процессах воркера."""
+    for geometry, options in SIZES.items():
+        get_thumbnail(image, geometry, **options)
@@ -0,0 +1,213 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import invalidate
+from core.jobs import enqueue
+
+from . import follow_graph
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .paginators import MergedCursorPaginator
+
+# версия кеша лент всех, кто читает знаменитостей при запросе
+CELEBRITIES_SCOPE = 'celebrities'
+CELEBRITIES_KEY = 'timeline:celebrities'
+# лента сортируется ключом самого поста: так ее можно сливать с
+# постами знаменитостей под одним курсором
+ORDERING = ('-pub_date', '-post_id')
+POST_ORDERING = ('-pub_date', '-id')
+
+
+def scope(user_id):
+    return 'timeline:%s' % user_id
+
+
+def celebrities():
+    """Id авторов, чьи посты подтягиваются при чтении, а не раскладываются.
+
+    Список меняется, только когда автор переходит порог
+    (followers_changed), поэтому хранится без срока.
+    """
+    ids = cache.get(CELEBRITIES_KEY)
+    if ids is None:
+        ids = frozenset(AuthorStats.objects.filter(
+            followers_count__gt=settings.TIMELINE_CELEBRITY_FOLLOWERS,
+        ).values_list('user_id', flat=True))
+        cache.set(CELEBRITIES_KEY, ids, None)
+    return ids
+
+
+def followed_celebrities(user):
+    """Знаменитости, на которых подписан пользователь."""
+    everyone = celebrities()
+    if not everyone:
+        return frozenset()
+    following = follow_graph.following(user.pk)
+    if following is None:
+        return frozenset(Follow.objects.filter(
+            user=user, author_id__in=everyone,
+        ).values_list('author_id', flat=True))
+    return everyone.intersection(following)
+
+
+def _insert(entries):
+    # batch_size не передаем: в Django 2.2 он отменяет предел SQLite
+    # на число строк в одном INSERT, а свой размер пачки Django подберет
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def _follower_batches(author_id):
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    batch = []
+    for user_id in followers.iterator(chunk_size=settings.TIMELINE_BATCH_SIZE):
+        batch.append(user_id)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _recent_posts(author_id):
+    return list(Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT])
+
+
+def _entries(user_id, author_id, posts):
+    return [
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts
+    ]
+
+
+def fan_out(post_id):
+    """Раскладывает новый пост по лентам подписчиков автора пачками."""
+    post = Post.objects.filter(pk=post_id).values(
+        'id', 'author_id', 'pub_date'
+    ).first()
+    if post is None:
+        return
+    if post['author_id'] in celebrities():
+        invalidate(CELEBRITIES_SCOPE)
+        return
+    for user_ids in _follower_batches(post['author_id']):
+        _insert([
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post['id'],
+                author_id=post['author_id'],
+                pub_date=post['pub_date'],
+            )
+            for user_id in user_ids
+        ])
+        invalidate(*map(scope, user_ids))
+
+
+def touch(author_id):
+    """Сбрасывает кеш лент подписчиков после правки или удаления поста."""
+    if author_id in celebrities():
+        invalidate(CELEBRITIES_SCOPE)
+        return
+    for user_ids in _follower_batches(author_id):
+        invalidate(*map(scope, user_ids))
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    invalidate(scope(user_id))
+    if author_id in celebrities():
+        return
+    _insert(_entries(user_id, author_id, _recent_posts(author_id)))
+
+
+def catch_up(author_id):
+    """Раскладывает подписчикам последние посты автора, который
+    перестал быть знаменитостью: пока он ей был, посты не
+    раскладывались."""
+    if author_id in celebrities():
+        return
+    posts = _recent_posts(author_id)
+    for user_ids in _follower_batches(author_id):
+        for user_id in user_ids:
+            _insert(_entries(user_id, author_id, posts))
+        invalidate(*map(scope, user_ids))
+
+
+def followers_changed(author_ids, delta):
+    """Следит за переходом авторов через порог знаменитости.
+
+    Вызывается после изменения их счетчиков подписчиков на delta: порог
+    перейден, только если счетчик встал ровно на его границу.
+    """
+    threshold = settings.TIMELINE_CELEBRITY_FOLLOWERS
+    boundary = threshold + 1 if delta > 0 else threshold
+    crossed = list(AuthorStats.objects.filter(
+        pk__in=author_ids, followers_count=boundary
+    ).values_list('pk', flat=True))
+    if not crossed:
+        return
+    cache.delete(CELEBRITIES_KEY)
+    transaction.on_commit(lambda: cache.delete(CELEBRITIES_KEY))
+    invalidate(CELEBRITIES_SCOPE)
+    if delta < 0:
+        for author_id in crossed:
+            enqueue(catch_up, author_id)
+
+
+def prune(user_id, *author_ids):
+    """Убирает из ленты посты авторов после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+    invalidate(scope(user_id))
+
+
+def feed(user, exclude=()):
+    """Записи ленты пользователя: диапазон индекса (user, pub_date).
+
+    exclude - авторы, чьи записи пропускаются: посты знаменитостей
+    читаются отдельно, а их старые записи остаются в ленте.
+    """
+    entries = TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+    if exclude:
+        entries = entries.exclude(author_id__in=exclude)
+    return entries
+
+
+def celebrity_paginator(user, per_page):
+    """Пагинатор ленты с подмешанными постами знаменитостей.
+
+    Лента и посты каждой знаменитости читаются своими диапазонами
+    индексов не длиннее страницы и сливаются под общим курсором.
+    None - пользователь не подписан на знаменитостей.
+    """
+    ids = followed_celebrities(user)
+    if not ids:
+        return None
+    return MergedCursorPaginator([
+        (feed(user, exclude=ids), ORDERING),
+        *(
+            (Post.objects.for_feed().filter(author_id=author_id),
+             POST_ORDERING)
+            for author_id in sorted(ids)
+        ),
+    ], per_page)
+
+
+def as_posts(page_obj):
+    """Заменяет записи ленты на сами посты внутри страницы."""
+    page_obj.object_list = [
+        item.post if isinstance(item, TimelineEntry) else item
+        for item in page_obj.object_list
+    ]
+    return page_obj
@@ -1,26 +1,55 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, Follow
+from .models import Post, Group, Follow, Comment
 from .forms import PostForm, CommentForm
 from django.contrib.auth import get_user_model
-from django.views.decorators.cache import cache_page
+from core.cache import cache_versioned, conditional_versioned
+from core.db_router import use_primary
+from .paginators import CursorPaginator
+from .search import SearchPaginator
+from . import counters, follows, groups, thumbnails, timeline
 
 
 User = get_user_model()
 NUMBER_OF_POST = 10
+# Дальше этого числа записей нумерованные страницы не строятся:
+# COUNT(*) и OFFSET на больших выборках становятся слишком дорогими.
+NUMBERED_PAGINATION_LIMIT = 1000
+POST_AUTHOR_KEY = 'post-author:%s'
+COMMENTS_PER_PAGE = 20
+FOLLOWS_PER_PAGE = 20
 
 
-def pag(queryset, request):
-    """Paginator"""
-    paginator = Paginator(queryset, NUMBER_OF_POST)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def pag(queryset, request, ordering=('-pub_date', '-id')):
+    """Paginator
 
+    Небольшие выборки листаются по номерам страниц, большие и любые
+    запросы с параметром `cursor` - по курсору (pub_date, id).
+    """
+    cursor = request.GET.get('cursor')
+    if cursor is None:
+        total = queryset.order_by().values('pk')[
+            :NUMBERED_PAGINATION_LIMIT + 1
+        ].count()
+        if total <= NUMBERED_PAGINATION_LIMIT:
+            paginator = Paginator(queryset, NUMBER_OF_POST)
+            # ограниченный COUNT уже посчитал все записи
+            paginator.count = total
+            return paginator.get_page(request.GET.get('page'))
+    return CursorPaginator(
+        queryset, NUMBER_OF_POST, ordering
+    ).get_page(cursor)
 
-@cache_page(20, key_prefix='page_index')
+
+@cache_versioned('posts', shared=True)
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.for_feed()
     page_obj = pag(post_list, request)
     context = {
         'page_obj': page_obj,
@@ -28,9 +57,12 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@cache_versioned('group:{slug}', shared=True)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group)
+    group = groups.get_by_slug(slug)
+    if group is None:
+        raise Http404('Группа не найдена')
+    posts = group.posts.for_feed()
     page_obj = pag(posts, request)
     context = {
         'group': group,
@@ -39,35 +71,92 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_versioned('groups', shared=True)
+def group_directory(request):
+    """Каталог групп: число постов и время последнего из GroupStats."""
+    directory = Group.objects.select_related('stats').order_by(
+        F('stats__last_post_at').desc(nulls_last=True), 'title',
+    )
+    return render(request, 'posts/group_directory.html', {
+        'groups': directory,
+    })
+
+
+@cache_versioned('author:{username}', shared=True)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('group', 'author')
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    post_list = author.posts.for_feed()
     page_obj = pag(post_list, request)
-    following = request.user.is_authenticated and (
-        Follow.objects.filter(user=request.user, author=author).exists())
+    stats = counters.stats_for(author)
     context = {
         'page_obj': page_obj,
         'author': author,
-        'following': following,
+        'stats': stats,
+        'posts_count': stats.posts_count,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def post_author_scope(request, post_id):
+    """Область автора: страница поста показывает число его постов.
+
+    Автор у поста не меняется, но его имя может смениться, поэтому
+    оно кешируется не дольше страниц.
+    """
+    key = POST_AUTHOR_KEY % post_id
+    username = cache.get(key)
+    if username is None:
+        username = Post.objects.filter(pk=post_id).values_list(
+            'author__username', flat=True
+        ).first()
+        if username is None:
+            return []
+        cache.set(key, username, settings.PAGE_CACHE_TIMEOUT)
+    return ['author:%s' % username]
+
+
+def comments_page(post_id, request):
+    """Страница комментариев поста по курсору (created, id)."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('id', 'text', 'created', 'post_id', 'author__username')
+    paginator = CursorPaginator(
+        comments, COMMENTS_PER_PAGE, ordering=('created', 'id')
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+# форма комментария с CSRF-токеном и ссылка на правку - в дырках
+@cache_versioned('post:{post_id}', post_author_scope, shared=True)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    number_all = Post.objects.filter(author=post.author).count()
-    form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.for_detail(), pk=post_id)
+    number_all = counters.stats_for(post.author).posts_count
     context = {
         'post': post,
         'number_all': number_all,
-        'form': form,
-        'comments': comments
+        'comments': comments_page(post.pk, request),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional_versioned('post:{post_id}')
+def post_comments(request, post_id):
+    """Следующая страница комментариев - только HTML списка."""
+    comments = comments_page(post_id, request)
+    # комментарии удаляются вместе с постом: проверка нужна лишь пустой
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
+@use_primary
 def post_create(request):
     if request.method == 'POST':
         form = PostForm(
@@ -78,6 +167,8 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            if post.image:
+                thumbnails.enqueue(post)
             return redirect('posts:profile', request.user.username)
     form = PostForm()
     context = {
@@ -87,9 +178,10 @@ def post_create(request):
 
 
 @login_required
+@use_primary
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    if request.user != post.author:
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail', post_id)
     form = PostForm(
         request.POST or None,
@@ -100,7 +192,10 @@ def post_edit(request, post_id):
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            # счетчики обновляются отдельно, не перезаписываем их
+            post.save(update_fields=PostForm.Meta.fields)
+            if 'image' in form.changed_data and post.image:
+                thumbnails.enqueue(post)
             return redirect('posts:post_detail', post_id)
     context = {
         'is_edit': True,
@@ -111,8 +206,9 @@ def post_edit(request, post_id):
 
 
 @login_required
+@use_primary
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -123,28 +219,95 @@ def add_comment(request, post_id):
 
 
 @login_required
+@cache_versioned('timeline:{user.pk}', timeline.CELEBRITIES_SCOPE)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = pag(post_list, request)
+    paginator = timeline.celebrity_paginator(request.user, NUMBER_OF_POST)
+    if paginator is None:
+        page_obj = pag(timeline.feed(request.user), request, timeline.ORDERING)
+    else:
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    page_obj = timeline.as_posts(page_obj)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+def follow_response(request, author, following):
+    """Ответ на подписку: короткий JSON для fetch, иначе - назад
+    к автору, а не на дорогую ленту подписок."""
+    if request.is_ajax():
+        return JsonResponse({
+            'username': author.username, 'following': following,
+        })
+    return redirect('posts:profile', author.username)
+
+
 @login_required
+@use_primary
 def profile_follow(request, username):
-    user = get_object_or_404(User, username=username)
+    user = get_object_or_404(User.objects.only('id', 'username'),
+                             username=username)
     if request.user == user:
-        return redirect('posts:profile', request.user.username)
-    if not Follow.objects.filter(user=request.user, author=user).exists():
-        Follow.objects.get_or_create(user=request.user, author=user)
-    return redirect('posts:follow_index')
+        return follow_response(request, user, False)
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=request.user, author=user)
+    except IntegrityError:
+        # повторная подписка: уникальность пары проверяет база
+        pass
+    return follow_response(request, user, True)
 
 
 @login_required
+@use_primary
 def profile_unfollow(request, username):
-    user = get_object_or_404(User, username=username)
+    user = get_object_or_404(User.objects.only('id', 'username'),
+                             username=username)
     follow = get_object_or_404(Follow, user=request.user, author=user)
     follow.delete()
-    return redirect('posts:index')
+    return follow_response(request, user, False)
+
+
+def follow_list(request, username, queryset, side, title):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    page_obj = CursorPaginator(
+        queryset(author.pk), FOLLOWS_PER_PAGE, ordering=follows.ORDERING
+    ).get_page(request.GET.get('cursor'))
+    page_obj.object_list = [
+        getattr(follow, side) for follow in page_obj.object_list
+    ]
+    context = {
+        'author': author,
+        'stats': counters.stats_for(author),
+        'title': title,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+@cache_versioned('author:{username}', shared=True)
+def followers(request, username):
+    return follow_list(
+        request, username, follows.followers, 'user', 'Подписчики'
+    )
+
+
+@cache_versioned('author:{username}', shared=True)
+def following(request, username):
+    return follow_list(
+        request, username, follows.following, 'author', 'Подписки'
+    )
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, NUMBER_OF_POST)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
@@ -0,0 +1,24 @@
+// Следующие страницы комментариев подгружаются фрагментом
+// без перезагрузки страницы; без JS ссылка открывает ее целиком.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('.comments-more');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  link.classList.add('disabled');
+  fetch(link.dataset.fragment, {credentials: 'same-origin'})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      link.insertAdjacentHTML('afterend', html);
+      link.remove();
+    })
+    .catch(function () {
+      window.location = link.href;
+    });
+});
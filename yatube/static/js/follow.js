@@ -0,0 +1,30 @@
+// Подписка и отписка без перезагрузки: сервер отвечает коротким JSON;
+// без JS ссылка ведет на страницу автора.
+document.addEventListener('click', function (event) {
+  var button = event.target.closest('.follow-toggle');
+  if (!button) {
+    return;
+  }
+  event.preventDefault();
+  button.classList.add('disabled');
+  fetch(button.href, {
+    credentials: 'same-origin',
+    headers: {'X-Requested-With': 'XMLHttpRequest'}
+  })
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.json();
+    })
+    .then(function (data) {
+      button.href = data.following ? button.dataset.unfollow : button.dataset.follow;
+      button.textContent = data.following ? 'Отписаться' : 'Подписаться';
+      button.classList.toggle('btn-light', data.following);
+      button.classList.toggle('btn-primary', !data.following);
+      button.classList.remove('disabled');
+    })
+    .catch(function () {
+      window.location = button.href;
+    });
+});
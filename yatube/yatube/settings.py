@@ -1,5 +1,7 @@
 
+import importlib.util
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -12,7 +14,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = 'p$roesye2_c70m)w&q^x34eap#!147w2=k5p34(l_ejvijrb^@'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Режим отладки включается явно: DJANGO_DEBUG=1.
+DEBUG = os.environ.get('DJANGO_DEBUG', '0') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -38,20 +41,26 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db_router.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# django-debug-toolbar - только для разработки и только если установлен
+if DEBUG and importlib.util.find_spec('debug_toolbar'):
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
@@ -60,7 +69,7 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.profiling.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -88,6 +97,31 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения (core.db_router): пути к копиям SQLite
+# через запятую в DATABASE_REPLICAS. В тестах реплики зеркалят default.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1
+):
+    DATABASES['replica%s' % number] = dict(
+        DATABASES['default'], NAME=name, TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append('replica%s' % number)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Настройка соединений SQLite (core.sqlite): WAL, synchronous=NORMAL
+# и BEGIN IMMEDIATE для конкурентной записи
+SQLITE_TUNING = True
+# миллисекунды ожидания блокировки записи
+SQLITE_BUSY_TIMEOUT = 5000
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+# отрицательное значение - размер в КиБ
+SQLITE_CACHE_SIZE = -64 * 1024
+
+# После записи чтения пользователя идут в основную базу столько секунд
+REPLICA_STICKY_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -141,8 +175,79 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Версии областей, блокировки single-flight и граф подписок должны быть
+# общими для всех процессов (веб-воркеры, thumbnail_worker), поэтому
+# в продакшене кеш - memcached по адресам из CACHE_LOCATION. Без него
+# кеш живет в памяти процесса, и ключи в нем не живут дольше
+# LOCAL_CACHE_MAX_TIMEOUT секунд: изменения из других процессов видны
+# с такой задержкой.
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION')
+LOCAL_CACHE_MAX_TIMEOUT = 60
+
+if CACHE_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.profiling.MemcachedCache',
+            'LOCATION': CACHE_LOCATION.split(','),
+        }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.profiling.LocMemCache',
+            'OPTIONS': {'MAX_TIMEOUT': LOCAL_CACHE_MAX_TIMEOUT},
+        }
+    }
+
+# Фоновые задачи (core.jobs): в пуле потоков после коммита. В
+# разработке и тестах выполняются сразу; BACKGROUND_JOBS_ASYNC=0/1
+# задает режим явно.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+BACKGROUND_JOBS_ASYNC = os.environ.get(
+    'BACKGROUND_JOBS_ASYNC', '0' if DEBUG or TESTING else '1'
+) == '1'
+BACKGROUND_JOBS_WORKERS = 4
+BACKGROUND_JOBS_QUEUE_SIZE = 1000
+
+# Лента подписок (posts.timeline)
+TIMELINE_BATCH_SIZE = 1000
+TIMELINE_BACKFILL_LIMIT = 1000
+# Посты авторов с большим числом подписчиков не раскладываются
+# по лентам, а подтягиваются при чтении.
+TIMELINE_CELEBRITY_FOLLOWERS = 10000
+
+# Граф подписок в кеше (posts.follow_graph). Подписки сверх лимита
+# не хранятся списком, а проверяются попарно.
+FOLLOW_GRAPH_LIMIT = 10000
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+
+# Страницы лент кешируются под версиями областей (core.cache),
+# поэтому срок жизни может быть долгим.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+# Пересчет страницы при промахе - один на всех (core.single_flight):
+# остальные ждут до WAIT секунд или получают копию, устаревшую не
+# больше чем на STALE секунд; BETA - насколько заранее обновлять.
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10
+SINGLE_FLIGHT_WAIT = 2.0
+SINGLE_FLIGHT_STALE = 60 * 5
+SINGLE_FLIGHT_BETA = 1.0
+# Карточки постов (posts.cards) кешируются под отпечатком содержимого,
+# срок жизни лишь освобождает память от устаревших версий.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Профилирование (core.profiling): доля запросов в выборке и вывод
+# замеров в заголовок Server-Timing. Строки лога - в логгере
+# core.profiling с уровнем INFO. Заголовок включается отдельно от DEBUG:
+# REQUEST_PROFILING_HEADER=1 в окружении продакшена.
+REQUEST_PROFILING_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+REQUEST_PROFILING_HEADER = os.environ.get(
+    'REQUEST_PROFILING_HEADER', '1' if DEBUG else '0'
+) == '1'
+
+# Метрики Prometheus (core.metrics) на /metrics. При нескольких
+# воркерах METRICS_DIR - общий каталог, где каждый процесс хранит
+# свой файл; без него метрики только в памяти процесса.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 1.0
+# Доступ без входа под персоналом: заголовок Authorization: Bearer <токен>
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')